@@ -1,39 +1,161 @@
 import aiosparkapi.requests
+from .cache import ResponseCache
+from .codec import JsonCodec
+from .ndjson import NdjsonExporter
+from .ratelimit import RateLimiter, TokenBucket
+from .receiver import MessageEnricher, WebhookReceiver
+from .requests import Checkpoint
+from .scheduler import Priority
+from .watermarks import MemoryWatermarkStore, Watermark
 from .api.messages import Messages
 from .api.webhooks import Webhooks
 from .api.people import People
 from .api.memberships import Memberships
 from .api.rooms import Rooms
+from .api.teams import TeamMemberships, Teams
 
 import aiohttp
 
 
 class AioSparkApi:
 
-    def __init__(self, *, access_token):
+    def __init__(self,
+                 *,
+                 access_token,
+                 max_retries=3,
+                 retry_jitter=1.0,
+                 max_retry_after=300,
+                 rate_limiter=None,
+                 max_in_flight=None,
+                 session=None,
+                 connection_limit=100,
+                 connection_limit_per_host=0,
+                 dns_cache_ttl=300,
+                 keepalive_timeout=60,
+                 timeout=None,
+                 timeouts=None,
+                 read_ahead=0,
+                 cache=None,
+                 json_codec=None,
+                 baseurl='https://api.ciscospark.com/v1'):
+        '''Client for the Cisco Spark api
+
+        Args:
+            access_token(str): The token used to authenticate requests.
+            max_retries(int): How many times a request answered with 429 is
+                retried.
+            retry_jitter(float): Upper bound, in seconds, of the random
+                delay added when resuming after a 429.
+            max_retry_after(float): Retry-After values longer than this
+                raise TooManyRequests instead of waiting.
+            rate_limiter(RateLimiter): Client side rate limit for the token.
+            max_in_flight(int): Largest number of concurrent requests.
+            session(aiohttp.ClientSession): Session to send requests on. The
+                session is not closed by close(), and the connection
+                arguments below are ignored.
+            connection_limit(int): Size of the connection pool.
+            connection_limit_per_host(int): Connections per host, 0 means
+                no limit besides connection_limit.
+            dns_cache_ttl(int): Seconds to cache DNS lookups.
+            keepalive_timeout(float): Seconds to keep idle connections open
+                for reuse.
+            timeout(aiohttp.ClientTimeout): Default timeout for the session.
+            timeouts(dict): Timeouts, in seconds or as ClientTimeout, for
+                single operations. Keys are 'list', 'get', 'create',
+                'update', 'delete' and 'download'.
+            read_ahead(int): Number of pages listings fetch in the
+                background, ahead of the consumer.
+            cache(ResponseCache): Cache for getting people, rooms and other
+                resources by id.
+            json_codec(JsonCodec): Encodes and decodes JSON. Defaults to
+                orjson when it is installed.
+            baseurl(str): Where the api is, like the url of a
+                FakeSparkServer when testing.
+        '''
         self._token = access_token
+        self._max_retries = max_retries
+        self._retry_jitter = retry_jitter
+        self._max_retry_after = max_retry_after
+        self._rate_limiter = rate_limiter
+        self._max_in_flight = max_in_flight
+        self._session = session
+        self._connection_limit = connection_limit
+        self._connection_limit_per_host = connection_limit_per_host
+        self._dns_cache_ttl = dns_cache_ttl
+        self._keepalive_timeout = keepalive_timeout
+        self._timeout = timeout
+        self._timeouts = timeouts
+        self._read_ahead = read_ahead
+        self._cache = cache
+        self._json_codec = json_codec
+        self._baseurl = baseurl
+
+    def _create_session(self):
+        connector = aiohttp.TCPConnector(
+            limit=self._connection_limit,
+            limit_per_host=self._connection_limit_per_host,
+            ttl_dns_cache=self._dns_cache_ttl,
+            keepalive_timeout=self._keepalive_timeout)
+
+        kwargs = {}
+        if self._timeout is not None:
+            kwargs['timeout'] = self._timeout
+        return aiohttp.ClientSession(connector=connector, **kwargs)
 
     async def setup(self):
-        self._client = aiohttp.ClientSession()
+        self._owns_client = self._session is None
+        if self._owns_client:
+            self._client = self._create_session()
+        else:
+            self._client = self._session
         self._requests = aiosparkapi.requests.Requests(
             self._token,
             self._client,
-            baseurl='https://api.ciscospark.com/v1')
+            baseurl=self._baseurl,
+            max_retries=self._max_retries,
+            retry_jitter=self._retry_jitter,
+            max_retry_after=self._max_retry_after,
+            rate_limiter=self._rate_limiter,
+            max_in_flight=self._max_in_flight,
+            timeouts=self._timeouts,
+            read_ahead=self._read_ahead,
+            cache=self._cache,
+            json_codec=self._json_codec)
 
         self.messages = Messages(self._requests)
         self.webhooks = Webhooks(self._requests)
         self.people = People(self._requests)
         self.memberships = Memberships(self._requests)
         self.rooms = Rooms(self._requests)
+        self.teams = Teams(self._requests)
+        self.team_memberships = TeamMemberships(self._requests)
+
+    @property
+    def scheduler(self):
+        return self._requests.scheduler
 
-    def close(self):
-        self._client.close()
+    async def close(self):
+        if self._owns_client:
+            await self._client.close()
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
-        self.close()
+        await self.close()
 
 
-__all__ = ['AioSparkApi']
+__all__ = [
+    'AioSparkApi',
+    'Checkpoint',
+    'JsonCodec',
+    'MemoryWatermarkStore',
+    'MessageEnricher',
+    'NdjsonExporter',
+    'Priority',
+    'RateLimiter',
+    'ResponseCache',
+    'TokenBucket',
+    'Watermark',
+    'WebhookReceiver',
+]
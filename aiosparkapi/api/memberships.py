@@ -1,11 +1,41 @@
-from aiosparkapi.baseresponse import BaseResponse
+import asyncio
+import collections
+
+from aiosparkapi.baseresponse import BaseResponse, field, optional_field
 from aiosparkapi.async_generator import AsyncGenerator
+from aiosparkapi.scheduler import Priority
 
 
 class Membership(BaseResponse):
 
-    def __init__(self, result):
-        super(Membership, self).__init__(result)
+    __slots__ = ()
+
+    id = field('id')
+    roomId = field('roomId')
+    personId = field('personId')
+    personEmail = field('personEmail')
+    isModerator = field('isModerator')
+    isMonitor = field('isMonitor')
+    created = field('created')
+    personDisplayName = optional_field('personDisplayName')
+    personOrgId = optional_field('personOrgId')
+
+
+class AddMemberResult(collections.namedtuple(
+        'AddMemberResult', ['email', 'membership', 'error', 'existing'])):
+    '''Outcome of adding one person with Memberships.add_members.
+
+    Attributes:
+        email(str): The email address of the person.
+        membership(Membership): The membership of the person, or None if
+            adding the person failed.
+        error(Exception): Why adding the person failed, or None.
+        existing(bool): If the person already was a member of the room.
+    '''
+
+    @property
+    def ok(self):
+        return self.error is None
 
 
 class Memberships:
@@ -27,5 +57,104 @@ class Memberships:
         result = await self._requests.list('memberships', parameters)
         return AsyncGenerator(result, Membership)
 
+    async def resume(self, checkpoint):
+        '''Continue a list from a checkpoint taken while iterating.'''
+        assert checkpoint.resource == 'memberships'
+        result = await self._requests.resume(checkpoint)
+        return AsyncGenerator(result, Membership)
+
     async def get(self, membership_id):
         return Membership(await self._requests.get('memberships', membership_id))
+
+    async def create(self,
+                     roomId=None,
+                     personId=None,
+                     personEmail=None,
+                     isModerator=False,
+                     *,
+                     priority=Priority.NORMAL):
+
+        assert roomId is not None
+        assert (personId is None) != (personEmail is None)
+
+        parameters = {
+            'roomId': roomId,
+            'isModerator': isModerator,
+        }
+        if personId:
+            parameters['personId'] = personId
+        if personEmail:
+            parameters['personEmail'] = personEmail
+
+        return Membership(await self._requests.create(
+            'memberships', parameters, priority=priority))
+
+    async def update(self, membership_id, isModerator=None):
+        assert isModerator is not None
+
+        response = await self._requests.update(
+            'memberships', membership_id, {'isModerator': isModerator})
+        return Membership(response)
+
+    async def delete(self, membership_id):
+        await self._requests.delete('memberships', membership_id)
+
+    async def _add_one(self, roomId, email, isModerator):
+        try:
+            membership = await self.create(
+                roomId=roomId,
+                personEmail=email,
+                isModerator=isModerator,
+                priority=Priority.BULK)
+        except Exception as error:
+            return AddMemberResult(email, None, error, False)
+        return AddMemberResult(email, membership, None, False)
+
+    async def add_members(self, roomId, emails, *, isModerator=False,
+                          concurrency=10):
+        '''Add many people to a room concurrently
+
+        The members of the room are listed once, and people who already
+        are members are not added again. A person failing to be added does
+        not stop the others. The memberships are created with bulk
+        priority, so other requests on the same client are sent first.
+
+        Args:
+            roomId(str): The room to add the people to.
+            emails(iterable): The email addresses of the people.
+            isModerator(bool): Make the added people moderators.
+            concurrency(int): Largest number of people added at once.
+
+        Returns:
+            list: An AddMemberResult for every email address, in the same
+                order as emails.
+        '''
+        assert concurrency > 0
+        emails = list(emails)
+
+        members = {}
+        async for membership in await self.list(roomId=roomId):
+            email = membership._result.get('personEmail')
+            if email:
+                members[email.lower()] = membership
+
+        results = {}
+        missing = collections.OrderedDict()
+        for index, email in enumerate(emails):
+            existing = members.get(email.lower())
+            if existing is not None:
+                results[index] = AddMemberResult(email, existing, None, True)
+            else:
+                missing.setdefault(email.lower(), []).append(index)
+
+        pending = iter(missing.values())
+
+        async def add():
+            for indexes in pending:
+                result = await self._add_one(
+                    roomId, emails[indexes[0]], isModerator)
+                for index in indexes:
+                    results[index] = result._replace(email=emails[index])
+
+        await asyncio.gather(*[add() for _ in range(concurrency)])
+        return [results[index] for index in range(len(emails))]
@@ -1,70 +1,219 @@
+import asyncio
+import collections
+import os
 import urllib.parse
 
-from aiosparkapi.baseresponse import BaseResponse
+from aiosparkapi.baseresponse import BaseResponse, field, optional_field
 from aiosparkapi.async_generator import AsyncGenerator
+from aiosparkapi.api.memberships import Membership
+from aiosparkapi.scheduler import Priority
+from aiosparkapi.upload import Upload
+from aiosparkapi.watermarks import Watermark
 
 
 def _is_url(url):
+    if not isinstance(url, str):
+        return False
     parsed = urllib.parse.urlparse(url)
     return parsed.scheme.lower() in ['http', 'https', 'ftp'] and parsed.netloc
 
 
 class Message(BaseResponse):
 
-    def __init__(self, result):
-        super(Message, self).__init__(result)
+    __slots__ = ()
+
+    id = field('id')
+    roomId = field('roomId')
+    roomType = field('roomType')
+    personId = field('personId')
+    personEmail = field('personEmail')
+    created = field('created')
+    toPersonId = optional_field('toPersonId')
+    toPersonEmail = optional_field('toPersonEmail')
+    text = optional_field('text')
+    html = optional_field('html')
+    markdown = optional_field('markdown')
+    mentionedPeople = optional_field('mentionedPeople')
+    files = optional_field('files')
+
+
+def _unique_path(directory, filename, taken):
+    filename = os.path.basename(filename or '') or 'file'
+    name, extension = os.path.splitext(filename)
+    path = os.path.join(directory, filename)
+    number = 0
+    while path in taken or os.path.exists(path):
+        number += 1
+        path = os.path.join(
+            directory, '{}-{}{}'.format(name, number, extension))
+    taken.add(path)
+    return path
+
+
+class CreateResult(collections.namedtuple(
+        'CreateResult', ['arguments', 'message', 'error'])):
+    '''Outcome of sending one message with Messages.create_many.
+
+    Attributes:
+        arguments(dict): The arguments the message was created from.
+        message(Message): The created message, or None if it failed.
+        error(Exception): Why the message failed, or None.
+    '''
 
     @property
-    def id(self):
-        return self._result['id']
+    def ok(self):
+        return self.error is None
 
-    @property
-    def roomId(self):
-        return self._result['roomId']
 
-    @property
-    def roomType(self):
-        return self._result['roomType']
+class RoomMessage(collections.namedtuple(
+        'RoomMessage', ['roomId', 'message'])):
+    '''A message yielded by Messages.export, with the room it was listed
+    from.'''
 
-    @property
-    def personId(self):
-        return self._result['personId']
 
-    @property
-    def personEmail(self):
-        return self._result['personEmail']
+class ExportProgress(collections.namedtuple(
+        'ExportProgress',
+        ['rooms_started', 'rooms_done', 'messages', 'errors'])):
+    '''How far Messages.export has got.
 
-    @property
-    def created(self):
-        return self._result['created']
+    Attributes:
+        rooms_started(int): Rooms which messages have been listed from.
+        rooms_done(int): Rooms which all messages have been listed from,
+            or which failed.
+        messages(int): Messages listed.
+        errors(int): Rooms which failed.
+    '''
 
-    @property
-    def toPersonId(self):
-        return self._result.get('toPersonId')
 
-    @property
-    def toPersonEmail(self):
-        return self._result.get('toPersonEmail')
+def _room_id(room):
+    if isinstance(room, str):
+        return room
+    if isinstance(room, Membership):
+        return room.roomId
+    return room.id
 
-    @property
-    def text(self):
-        return self._result.get('text')
 
-    @property
-    def html(self):
-        return self._result.get('html')
+_done = object()
 
-    @property
-    def markdown(self):
-        return self._result.get('markdown')
 
-    @property
-    def mentionedPeople(self):
-        return self._result.get('mentionedPeople')
+class MessageExport:
+    '''Lists the messages of many rooms concurrently, see Messages.export.
+    '''
 
-    @property
-    def files(self):
-        return self._result.get('files')
+    def __init__(self, requests, rooms, concurrency, max, progress,
+                 queue_size):
+        self._requests = requests
+        if hasattr(rooms, '__aiter__'):
+            self._rooms = rooms.__aiter__()
+        else:
+            self._rooms = iter(rooms)
+        self._rooms_lock = asyncio.Lock()
+        self._concurrency = concurrency
+        self._max = max
+        self._progress = progress
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._workers = None
+        self._running = 0
+
+        self.rooms_started = 0
+        self.rooms_done = 0
+        self.messages = 0
+        self.errors = []
+
+    def progress(self):
+        '''Get how far the export has got.
+
+        Returns:
+            ExportProgress: The rooms and messages listed so far.
+        '''
+        return ExportProgress(
+            self.rooms_started,
+            self.rooms_done,
+            self.messages,
+            len(self.errors))
+
+    async def _next_room(self):
+        async with self._rooms_lock:
+            if self._rooms is None:
+                return None
+            try:
+                if hasattr(self._rooms, '__anext__'):
+                    return await self._rooms.__anext__()
+                return next(self._rooms)
+            except (StopIteration, StopAsyncIteration):
+                self._rooms = None
+                return None
+            except Exception:
+                self._rooms = None
+                raise
+
+    async def _export_room(self, room_id):
+        parameters = {'roomId': room_id}
+        if self._max:
+            parameters['max'] = self._max
+        results = await self._requests.list(
+            'messages', parameters, priority=Priority.BULK)
+        try:
+            async for result in results:
+                self.messages += 1
+                await self._queue.put(RoomMessage(room_id, Message(result)))
+        finally:
+            await results.aclose()
+
+    async def _export_rooms(self):
+        while True:
+            try:
+                room = await self._next_room()
+            except Exception as error:
+                self.errors.append((None, error))
+                return
+            if room is None:
+                return
+
+            room_id = _room_id(room)
+            self.rooms_started += 1
+            try:
+                await self._export_room(room_id)
+            except Exception as error:
+                self.errors.append((room_id, error))
+            self.rooms_done += 1
+            if self._progress is not None:
+                try:
+                    self._progress(self.progress())
+                except Exception as error:
+                    self.errors.append((room_id, error))
+
+    async def _work(self):
+        try:
+            await self._export_rooms()
+        except Exception as error:
+            self.errors.append((None, error))
+        finally:
+            self._running -= 1
+        if not self._running:
+            await self._queue.put(_done)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._workers is None:
+            self._running = self._concurrency
+            self._workers = [asyncio.ensure_future(self._work())
+                             for _ in range(self._concurrency)]
+
+        if self._queue.empty() and not self._running:
+            raise StopAsyncIteration
+        item = await self._queue.get()
+        if item is _done:
+            raise StopAsyncIteration
+        return item
+
+    async def aclose(self):
+        '''Stop listing messages.'''
+        for worker in self._workers or []:
+            worker.cancel()
+        await asyncio.gather(*(self._workers or []), return_exceptions=True)
 
 
 class Messages:
@@ -97,14 +246,22 @@ class Messages:
         results = await self._requests.list('messages', kwargs)
         return AsyncGenerator(results, Message)
 
-    async def create(self,
-                     toRoomId=None,
-                     toPersonId=None,
-                     toPersonEmail=None,
-                     text=None,
-                     markdown=None,
-                     files=None,
-                     **kwargs):
+    async def resume(self, checkpoint):
+        '''Continue a list from a checkpoint taken while iterating.'''
+        assert checkpoint.resource == 'messages'
+        result = await self._requests.resume(checkpoint)
+        return AsyncGenerator(result, Message)
+
+    def _create_request(self,
+                        toRoomId=None,
+                        toPersonId=None,
+                        toPersonEmail=None,
+                        text=None,
+                        markdown=None,
+                        files=None,
+                        filename=None,
+                        content_type=None,
+                        **kwargs):
 
         number_of_recipients = 0
         for recipient in [toRoomId, toPersonId, toPersonEmail]:
@@ -131,22 +288,257 @@ class Messages:
                 request['files'] = files
             else:
                 multipart = True
-                request['file'] = {
-                    'content': open(files[0], 'rb'),
-                    'name': files[0],
-                }
+                request['file'] = Upload(files[0], filename, content_type)
 
         for key, value in kwargs.items():
             request[key] = value
 
+        return request, multipart
+
+    async def create(self,
+                     toRoomId=None,
+                     toPersonId=None,
+                     toPersonEmail=None,
+                     text=None,
+                     markdown=None,
+                     files=None,
+                     filename=None,
+                     content_type=None,
+                     **kwargs):
+        '''Send a message
+
+        Args:
+            toRoomId(str): The room to send the message to.
+            toPersonId(str): The person to send a direct message to.
+            toPersonEmail(str): The email of the person to send a direct
+                message to.
+            text(str): The plain text of the message.
+            markdown(str): The message, in markdown.
+            files(list): One file to attach. Either a URL, a local path,
+                bytes, a binary file object or an async iterable of bytes.
+                Local files are streamed, not read into memory.
+            filename(str): The name of the attached file. Defaults to the
+                name of the local file.
+            content_type(str): The type of the attached file. Defaults to a
+                guess from the filename.
+
+        Returns:
+            Message: The message that was sent.
+
+        Raises:
+            AssertionError: If the parameter types are incorrect.
+            SparkApiException: If the Cisco Spark cloud returns an error.
+        '''
+        request, multipart = self._create_request(
+            toRoomId=toRoomId,
+            toPersonId=toPersonId,
+            toPersonEmail=toPersonEmail,
+            text=text,
+            markdown=markdown,
+            files=files,
+            filename=filename,
+            content_type=content_type,
+            **kwargs)
         results = await self._requests.create(
             'messages',
             request,
             multipart=multipart)
         return Message(results)
 
+    async def _create_one(self, arguments):
+        try:
+            request, multipart = self._create_request(**arguments)
+            results = await self._requests.create(
+                'messages',
+                request,
+                multipart=multipart,
+                priority=Priority.BULK)
+        except Exception as error:
+            return CreateResult(arguments, None, error)
+        return CreateResult(arguments, Message(results), None)
+
+    async def create_many(self, messages, *, concurrency=10):
+        '''Send many messages concurrently
+
+        A failing message does not stop the others. The messages are sent
+        with bulk priority, so other requests on the same client are sent
+        before them.
+
+        Args:
+            messages(iterable): The arguments for create, as one dict per
+                message.
+            concurrency(int): Largest number of messages sent at once.
+
+        Returns:
+            list: A CreateResult for every message, in the same order as
+                messages.
+        '''
+        assert concurrency > 0
+        pending = enumerate(messages)
+        results = {}
+
+        async def send():
+            for index, arguments in pending:
+                results[index] = await self._create_one(arguments)
+
+        await asyncio.gather(*[send() for _ in range(concurrency)])
+        return [results[index] for index in range(len(results))]
+
     async def get(self, message_id):
         return Message(await self._requests.get('messages', message_id))
 
+    async def file_info(self, url):
+        '''Get the name, size and type of a file attached to a message,
+        without downloading it.
+
+        Args:
+            url(str): One of the urls in Message.files.
+
+        Returns:
+            FileInfo: Details about the file.
+        '''
+        return await self._requests.head(url)
+
+    def download(self, url, *, chunk_size=256 * 1024):
+        '''Stream a file attached to a message.
+
+        Args:
+            url(str): One of the urls in Message.files.
+            chunk_size(int): Largest number of bytes in every chunk.
+
+        Returns:
+            Download: An async context manager, which iterates over the
+                content in chunks, or saves it with Download.save.
+        '''
+        return self._requests.download(url, chunk_size=chunk_size)
+
+    async def download_files(self, files, directory, *, concurrency=4):
+        '''Save files attached to a message to a directory.
+
+        Args:
+            files(list): The urls to download, like Message.files.
+            directory(str): Where to save the files, using the names given
+                by the server. Files are never overwritten; when the name
+                is taken, a number is added to it, like report-1.txt.
+            concurrency(int): Largest number of files downloaded at once.
+
+        Returns:
+            list: The paths of the saved files, in the order of files.
+        '''
+        semaphore = asyncio.Semaphore(concurrency)
+        taken = set()
+
+        async def save(url):
+            async with semaphore:
+                async with self.download(url) as download:
+                    path = _unique_path(
+                        directory, download.info.filename, taken)
+                    return await download.save(path)
+
+        return await asyncio.gather(*[save(url) for url in files])
+
+    def export(self, rooms, *, concurrency=10, max=None, progress=None,
+               queue_size=1000):
+        '''List the messages of many rooms concurrently
+
+            export = api.messages.export(await api.rooms.list())
+            async for roomId, message in export:
+                ...
+
+        The rooms are listed by a fixed number of workers, each paging
+        through the messages of one room at a time. The messages are
+        requested with bulk priority, so the rate limiter and the limit on
+        requests in flight of the client keep the export within budget.
+        A room failing does not stop the export; (roomId, exception) is
+        added to the errors of the MessageExport instead. Call aclose on
+        the MessageExport to stop it before all messages are iterated.
+
+        Args:
+            rooms(iterable): Room ids, Rooms or Memberships, as a list or an
+                async iterator like the result of Rooms.list.
+            concurrency(int): Largest number of rooms listed at once.
+            max(int): Number of messages in every page.
+            progress(callable): Called with an ExportProgress every time
+                a room is done. Errors it raises are added to errors, and
+                do not stop the export.
+            queue_size(int): Largest number of messages listed, but not yet
+                iterated over.
+
+        Returns:
+            MessageExport: An async iterator, which yields a RoomMessage for
+                every message, mixing the messages of different rooms.
+        '''
+        assert concurrency > 0
+        return MessageExport(
+            self._requests, rooms, concurrency, max, progress, queue_size)
+
+    async def sync(self, roomId, store, *, max=50, backfill=False):
+        '''Get the messages sent to a room since the last sync
+
+        The newest message seen in the room is kept as a Watermark in the
+        store. The messages are listed newest first, and listing stops at
+        the watermark, so a room without new messages costs one request.
+
+        Args:
+            roomId(str): The room to get the messages from.
+            store: Keeps the watermarks, like a MemoryWatermarkStore.
+            max(int): Number of messages in every page.
+            backfill(bool): If the room has no watermark yet, get all its
+                messages. Otherwise only the watermark is set.
+
+        Returns:
+            list: The new Messages, oldest first.
+        '''
+        watermark = await store.get(roomId)
+        parameters = {'roomId': roomId, 'max': max}
+        if watermark is None and not backfill:
+            parameters['max'] = 1
+
+        # Reading ahead would fetch pages past the watermark
+        results = await self._requests.list(
+            'messages', parameters, read_ahead=0)
+        messages = []
+        try:
+            async for result in results:
+                message = Message(result)
+                if watermark is not None and (
+                        message.id == watermark.id or
+                        message.created < watermark.created):
+                    break
+                messages.append(message)
+                if watermark is None and not backfill:
+                    break
+        finally:
+            await results.aclose()
+
+        if messages:
+            newest = messages[0]
+            await store.set(roomId, Watermark(newest.id, newest.created))
+        if watermark is None and not backfill:
+            return []
+        messages.reverse()
+        return messages
+
+    async def sync_rooms(self, roomIds, store, *, concurrency=10, **kwargs):
+        '''Get the new messages of many rooms concurrently, see sync.
+
+        Args:
+            roomIds(iterable): The rooms to get the messages from.
+            store: Keeps the watermarks, like a MemoryWatermarkStore.
+            concurrency(int): Largest number of rooms synced at once.
+
+        Returns:
+            dict: The new Messages of every room, oldest first.
+        '''
+        semaphore = asyncio.Semaphore(concurrency)
+        roomIds = list(roomIds)
+
+        async def sync(roomId):
+            async with semaphore:
+                return await self.sync(roomId, store, **kwargs)
+
+        results = await asyncio.gather(*[sync(roomId) for roomId in roomIds])
+        return dict(zip(roomIds, results))
+
     async def delete(self, message_id):
         await self._requests.delete('messages', message_id)
@@ -1,79 +1,28 @@
-from aiosparkapi.baseresponse import BaseResponse
+from aiosparkapi.baseresponse import BaseResponse, field, optional_field
 from aiosparkapi.async_generator import AsyncGenerator
 
 
 class Person(BaseResponse):
 
-    def __init__(self, result):
-        self._result = result
-
-    @property
-    def id(self):
-        return self._result['id']
-
-    @property
-    def emails(self):
-        return self._result['emails']
-
-    @property
-    def displayName(self):
-        return self._result['displayName']
-
-    @property
-    def nickName(self):
-        return self._result.get('nickName')
-
-    @property
-    def firstName(self):
-        return self._result['firstName']
-
-    @property
-    def lastName(self):
-        return self._result['lastName']
-
-    @property
-    def avatar(self):
-        return self._result['avatar']
-
-    @property
-    def orgId(self):
-        return self._result['orgId']
-
-    @property
-    def roles(self):
-        return self._result.get('roles')
-
-    @property
-    def licenses(self):
-        return self._result.get('licenses')
-
-    @property
-    def timezone(self):
-        return self._result.get('timezone')
-
-    @property
-    def lastActivity(self):
-        return self._result['lastActivity']
-
-    @property
-    def status(self):
-        return self._result['status']
-
-    @property
-    def invitePending(self):
-        return self._result.get('invitePending')
-
-    @property
-    def loginEnabled(self):
-        return self._result.get('loginEnabled')
-
-    @property
-    def type(self):
-        return self._result['type']
-
-    @property
-    def created(self):
-        return self._result['created']
+    __slots__ = ()
+
+    id = field('id')
+    emails = field('emails')
+    displayName = field('displayName')
+    firstName = field('firstName')
+    lastName = field('lastName')
+    avatar = field('avatar')
+    orgId = field('orgId')
+    lastActivity = field('lastActivity')
+    status = field('status')
+    type = field('type')
+    created = field('created')
+    nickName = optional_field('nickName')
+    roles = optional_field('roles')
+    licenses = optional_field('licenses')
+    timezone = optional_field('timezone')
+    invitePending = optional_field('invitePending')
+    loginEnabled = optional_field('loginEnabled')
 
 
 class People:
@@ -85,6 +34,12 @@ class People:
         result = await self._requests.list('people', kwargs)
         return AsyncGenerator(result, Person)
 
+    async def resume(self, checkpoint):
+        '''Continue a list from a checkpoint taken while iterating.'''
+        assert checkpoint.resource == 'people'
+        result = await self._requests.resume(checkpoint)
+        return AsyncGenerator(result, Person)
+
     async def get(self, person_id):
         return Person(await self._requests.get('people', person_id))
 
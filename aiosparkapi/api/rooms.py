@@ -1,11 +1,19 @@
-from aiosparkapi.baseresponse import BaseResponse
+from aiosparkapi.baseresponse import BaseResponse, field, optional_field
 from aiosparkapi.async_generator import AsyncGenerator
 
 
 class Room(BaseResponse):
 
-    def __init__(self, result):
-        super(Room, self).__init__(result)
+    __slots__ = ()
+
+    id = field('id')
+    title = field('title')
+    type = field('type')
+    isLocked = field('isLocked')
+    lastActivity = field('lastActivity')
+    creatorId = field('creatorId')
+    created = field('created')
+    teamId = optional_field('teamId')
 
 
 class Rooms:
@@ -13,5 +21,71 @@ class Rooms:
     def __init__(self, requests):
         self._requests = requests
 
+    async def list(self, type=None, teamId=None, sortBy=None, max=None):
+        '''List the rooms the user is in
+
+        The rooms are fetched a page at a time while iterating, so all the
+        rooms are never kept in memory at once.
+
+        Args:
+            type(str): Only list rooms of the type 'direct' or 'group'.
+            teamId(str): Only list rooms in the team with id.
+            sortBy(str): Sort the rooms by 'id', 'lastactivity' or
+                'created'.
+            max(int): Limit the maximum number of rooms returned from the
+                Spark service per request.
+
+        Returns:
+            AsyncGenerator: When iterated, yields the rooms returned by the
+                query.
+
+        Raises:
+            AssertionError: If the parameters are incorrect.
+            SparkApiException: If the Cisco Spark cloud returns an error.
+        '''
+
+        assert type in (None, 'direct', 'group')
+        assert sortBy in (None, 'id', 'lastactivity', 'created')
+
+        parameters = {}
+        if type:
+            parameters['type'] = type
+        if teamId:
+            parameters['teamId'] = teamId
+        if sortBy:
+            parameters['sortBy'] = sortBy
+        if max:
+            parameters['max'] = max
+
+        result = await self._requests.list('rooms', parameters)
+        return AsyncGenerator(result, Room)
+
+    async def resume(self, checkpoint):
+        '''Continue a list from a checkpoint taken while iterating.'''
+        assert checkpoint.resource == 'rooms'
+        result = await self._requests.resume(checkpoint)
+        return AsyncGenerator(result, Room)
+
+    async def create(self, title=None, teamId=None):
+        assert title is not None
+
+        parameters = {
+            'title': title,
+        }
+        if teamId:
+            parameters['teamId'] = teamId
+
+        return Room(await self._requests.create('rooms', parameters))
+
     async def get(self, room_id):
         return Room(await self._requests.get('rooms', room_id))
+
+    async def update(self, room_id, title=None):
+        assert title is not None
+
+        response = await self._requests.update(
+            'rooms', room_id, {'title': title})
+        return Room(response)
+
+    async def delete(self, room_id):
+        await self._requests.delete('rooms', room_id)
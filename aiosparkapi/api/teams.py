@@ -0,0 +1,121 @@
+from aiosparkapi.baseresponse import BaseResponse, field, optional_field
+from aiosparkapi.async_generator import AsyncGenerator
+
+
+class Team(BaseResponse):
+
+    __slots__ = ()
+
+    id = field('id')
+    name = field('name')
+    creatorId = field('creatorId')
+    created = field('created')
+
+
+class TeamMembership(BaseResponse):
+
+    __slots__ = ()
+
+    id = field('id')
+    teamId = field('teamId')
+    personId = field('personId')
+    personEmail = field('personEmail')
+    isModerator = field('isModerator')
+    created = field('created')
+    personDisplayName = optional_field('personDisplayName')
+    personOrgId = optional_field('personOrgId')
+
+
+class Teams:
+
+    def __init__(self, requests):
+        self._requests = requests
+
+    async def list(self, max=None):
+        parameters = {}
+        if max:
+            parameters['max'] = max
+
+        result = await self._requests.list('teams', parameters)
+        return AsyncGenerator(result, Team)
+
+    async def resume(self, checkpoint):
+        '''Continue a list from a checkpoint taken while iterating.'''
+        assert checkpoint.resource == 'teams'
+        result = await self._requests.resume(checkpoint)
+        return AsyncGenerator(result, Team)
+
+    async def create(self, name=None):
+        assert name is not None
+
+        return Team(await self._requests.create('teams', {'name': name}))
+
+    async def get(self, team_id):
+        return Team(await self._requests.get('teams', team_id))
+
+    async def update(self, team_id, name=None):
+        assert name is not None
+
+        response = await self._requests.update(
+            'teams', team_id, {'name': name})
+        return Team(response)
+
+    async def delete(self, team_id):
+        await self._requests.delete('teams', team_id)
+
+
+class TeamMemberships:
+
+    def __init__(self, requests):
+        self._requests = requests
+
+    async def list(self, teamId=None, max=None):
+        assert teamId is not None
+
+        parameters = {'teamId': teamId}
+        if max:
+            parameters['max'] = max
+
+        result = await self._requests.list('team/memberships', parameters)
+        return AsyncGenerator(result, TeamMembership)
+
+    async def resume(self, checkpoint):
+        '''Continue a list from a checkpoint taken while iterating.'''
+        assert checkpoint.resource == 'team/memberships'
+        result = await self._requests.resume(checkpoint)
+        return AsyncGenerator(result, TeamMembership)
+
+    async def create(self,
+                     teamId=None,
+                     personId=None,
+                     personEmail=None,
+                     isModerator=False):
+
+        assert teamId is not None
+        assert (personId is None) != (personEmail is None)
+
+        parameters = {
+            'teamId': teamId,
+            'isModerator': isModerator,
+        }
+        if personId:
+            parameters['personId'] = personId
+        if personEmail:
+            parameters['personEmail'] = personEmail
+
+        return TeamMembership(
+            await self._requests.create('team/memberships', parameters))
+
+    async def get(self, membership_id):
+        return TeamMembership(
+            await self._requests.get('team/memberships', membership_id))
+
+    async def update(self, membership_id, isModerator=None):
+        assert isModerator is not None
+
+        response = await self._requests.update(
+            'team/memberships', membership_id, {'isModerator': isModerator})
+        return TeamMembership(response)
+
+    async def delete(self, membership_id):
+        await self._requests.delete('team/memberships', membership_id)
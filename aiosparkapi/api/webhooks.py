@@ -1,43 +1,85 @@
-from aiosparkapi.baseresponse import BaseResponse
+import asyncio
+import collections
+
+from aiosparkapi.baseresponse import BaseResponse, field, optional_field
 from aiosparkapi.async_generator import AsyncGenerator
+from aiosparkapi.api.messages import Message
+from aiosparkapi.api.memberships import Membership
+from aiosparkapi.api.rooms import Room
 
 
-class Webhook(BaseResponse):
+_models = {
+    'messages': Message,
+    'memberships': Membership,
+    'rooms': Room,
+}
 
-    def __init__(self, result):
-        super(Webhook, self).__init__(result)
 
-    @property
-    def id(self):
-        return self._result['id']
+class Webhook(BaseResponse):
 
-    @property
-    def name(self):
-        return self._result['name']
+    __slots__ = ()
 
-    @property
-    def targetUrl(self):
-        return self._result['targetUrl']
+    id = field('id')
+    name = field('name')
+    targetUrl = field('targetUrl')
+    resource = field('resource')
+    event = field('event')
+    created = field('created')
+    filter = optional_field('filter')
+    secret = optional_field('secret')
 
-    @property
-    def resource(self):
-        return self._result['resource']
 
-    @property
-    def event(self):
-        return self._result['event']
+class WebhookEvent(BaseResponse):
+    '''A notification sent by Spark to the target url of a webhook.'''
 
-    @property
-    def filter(self):
-        return self._result.get('filter')
+    __slots__ = ()
+
+    id = field('id')
+    name = field('name')
+    resource = field('resource')
+    event = field('event')
+    created = field('created')
+    filter = optional_field('filter')
+    orgId = optional_field('orgId')
+    createdBy = optional_field('createdBy')
+    appId = optional_field('appId')
+    ownedBy = optional_field('ownedBy')
+    status = optional_field('status')
+    actorId = optional_field('actorId')
 
     @property
-    def secret(self):
-        return self._result.get('secret')
+    def data(self):
+        '''The resource the event is about, as a Message, Membership or
+        Room. Webhooks only send the ids of the resource, not its content.
+        '''
+        Model = _models.get(self._result.get('resource'), BaseResponse)
+        return Model(self._result.get('data', {}))
+
+
+def _key(webhook):
+    return (webhook.get('name'),
+            webhook.get('resource'),
+            webhook.get('event'),
+            webhook.get('filter') or None)
+
+
+class SyncReport(collections.namedtuple(
+        'SyncReport',
+        ['created', 'updated', 'deleted', 'unchanged', 'errors'])):
+    '''Changes made by Webhooks.sync.
+
+    Attributes:
+        created(list): The created Webhooks.
+        updated(list): The Webhooks with a new targetUrl or secret.
+        deleted(list): The deleted Webhooks.
+        unchanged(list): The Webhooks already as desired.
+        errors(list): (webhook, exception) for the changes that failed,
+            where webhook is the desired dict or the existing Webhook.
+    '''
 
     @property
-    def created(self):
-        return self._result['created']
+    def ok(self):
+        return not self.errors
 
 
 class Webhooks:
@@ -52,6 +94,12 @@ class Webhooks:
         result = await self._requests.list('webhooks', parameters)
         return AsyncGenerator(result, Webhook)
 
+    async def resume(self, checkpoint):
+        '''Continue a list from a checkpoint taken while iterating.'''
+        assert checkpoint.resource == 'webhooks'
+        result = await self._requests.resume(checkpoint)
+        return AsyncGenerator(result, Webhook)
+
     async def create(self,
                      name=None,
                      targetUrl=None,
@@ -87,7 +135,8 @@ class Webhooks:
     async def update(self,
                      webhook_id,
                      name=None,
-                     targetUrl=None):
+                     targetUrl=None,
+                     secret=None):
 
         assert name is not None
         assert targetUrl is not None
@@ -96,6 +145,83 @@ class Webhooks:
             'name': name,
             'targetUrl': targetUrl,
         }
+        if secret:
+            request['secret'] = secret
 
         response = await self._requests.update('webhooks', webhook_id, request)
         return Webhook(response)
+
+    async def sync(self, desired, *, prune=True, concurrency=10):
+        '''Make the webhooks on the server match the desired webhooks.
+
+        The existing webhooks are listed once, and matched with the desired
+        ones by name, resource, event and filter. Missing webhooks are
+        created, and webhooks with another targetUrl, or another secret
+        when the desired webhook has one, are updated, so
+        running sync again makes no duplicates. Instances syncing at the
+        same time can each create a missing webhook; with prune, the
+        duplicates are deleted by the next sync. The changes are made
+        concurrently.
+
+        Args:
+            desired(iterable): dicts with the arguments of create.
+            prune(bool): Delete the existing webhooks which are not
+                desired, and duplicates of desired ones.
+            concurrency(int): Number of changes made at once.
+
+        Returns:
+            SyncReport: The changes made, and the ones that failed.
+        '''
+
+        wanted = collections.OrderedDict()
+        for webhook in desired:
+            wanted[_key(webhook)] = webhook
+
+        existing = collections.OrderedDict()
+        duplicates = []
+        async for webhook in await self.list():
+            key = _key(webhook._result)
+            if key in existing:
+                duplicates.append(webhook)
+            else:
+                existing[key] = webhook
+
+        report = SyncReport([], [], [], [], [])
+        changes = []
+        for key, webhook in wanted.items():
+            current = existing.get(key)
+            if current is None:
+                changes.append(
+                    (webhook, report.created, self.create(**webhook)))
+            elif (current.targetUrl != webhook['targetUrl'] or
+                    webhook.get('secret', current.secret) != current.secret):
+                changes.append((current, report.updated, self.update(
+                    current.id,
+                    name=current.name,
+                    targetUrl=webhook['targetUrl'],
+                    secret=webhook.get('secret'))))
+            else:
+                report.unchanged.append(current)
+
+        if prune:
+            unwanted = [webhook for key, webhook in existing.items()
+                        if key not in wanted]
+            for webhook in unwanted + duplicates:
+                changes.append(
+                    (webhook, report.deleted, self._deleted(webhook)))
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def apply(webhook, done, change):
+            try:
+                async with semaphore:
+                    done.append(await change)
+            except Exception as error:
+                report.errors.append((webhook, error))
+
+        await asyncio.gather(*[apply(*change) for change in changes])
+        return report
+
+    async def _deleted(self, webhook):
+        await self.delete(webhook.id)
+        return webhook
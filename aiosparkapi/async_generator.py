@@ -4,8 +4,15 @@ class AsyncGenerator:
         self._results = results
         self._Generate = Generate
 
-    async def __aiter__(self):
+    def __aiter__(self):
         return self
 
     async def __anext__(self):
         return self._Generate(await self._results.__anext__())
+
+    def checkpoint(self):
+        '''Get where the iteration got to, see Requests.resume.'''
+        return self._results.checkpoint()
+
+    async def aclose(self):
+        await self._results.aclose()
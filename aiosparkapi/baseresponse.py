@@ -1,14 +1,50 @@
 import json
 
 
+def field(name):
+    '''Read only property for a field of the response.
+
+    A missing field raises AttributeError, like any unknown attribute.
+    '''
+    def get(self):
+        try:
+            return self._result[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    return property(get)
+
+
+def optional_field(name):
+    '''Read only property for a field that may be missing from the response,
+    in which case it is None.'''
+    def get(self):
+        return self._result.get(name)
+
+    return property(get)
+
+
 class BaseResponse:
+    '''A resource returned by the Spark api.
+
+    The decoded response is kept as is, and fields are only looked up when
+    they are accessed. Subclasses declare the known fields with field and
+    optional_field, and must set __slots__ so instances stay small. Unknown
+    fields are still available as attributes.
+    '''
+
+    __slots__ = ('_result',)
 
     def __init__(self, result):
         self._result = result
 
     def __getattr__(self, item):
-        if item in self._result.keys():
-            return self._result[item]
+        try:
+            result = object.__getattribute__(self, '_result')
+        except AttributeError:
+            result = {}
+        if item in result:
+            return result[item]
         error = "'{}' object has no attribute '{}'".format(
                 self.__class__.__name__, item)
         raise AttributeError(error)
@@ -0,0 +1,74 @@
+import collections
+import time
+
+
+class ResponseCache:
+    '''Keeps results of Requests.get in memory for a while.
+
+    Only the resources given a time to live are cached. Entries are kept in
+    least recently used order, and the oldest are dropped when the cache is
+    full. Requests.update and Requests.delete invalidate the entry they
+    change.
+
+    Args:
+        ttls(dict): Seconds to keep results, by resource, like
+            {'people': 300, 'rooms': 60}.
+        maxsize(int): Largest number of results kept, for all resources.
+    '''
+
+    def __init__(self, ttls, maxsize=10000):
+        assert maxsize > 0
+        self._ttls = dict(ttls)
+        self._maxsize = maxsize
+        self._entries = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def caches(self, resource):
+        return resource in self._ttls
+
+    def get(self, resource, resource_id):
+        '''Look up a cached result.
+
+        Returns:
+            The cached result, or None if it is not cached or has expired.
+        '''
+        key = (resource, resource_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, result = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._entries[key]
+
+        self.misses += 1
+        return None
+
+    def set(self, resource, resource_id, result):
+        if not self.caches(resource):
+            return
+
+        key = (resource, resource_id)
+        expires = time.monotonic() + self._ttls[resource]
+        self._entries[key] = (expires, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, resource, resource_id=None):
+        '''Drop one cached result, or all results of a resource.'''
+        if resource_id is not None:
+            self._entries.pop((resource, resource_id), None)
+            return
+
+        for key in [key for key in self._entries if key[0] == resource]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,35 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _json_loads(data):
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+class JsonCodec:
+    '''Encodes request bodies and decodes responses.
+
+    Args:
+        loads(callable): Decodes a JSON document given as bytes. Must raise
+            ValueError for invalid documents.
+        dumps(callable): Encodes an object to a JSON document, as str or
+            bytes.
+    '''
+
+    def __init__(self, loads=_json_loads, dumps=json.dumps):
+        self.loads = loads
+        self.dumps = dumps
+
+
+def default_codec():
+    '''Returns a codec using orjson if it is installed, and the json module
+    otherwise.'''
+    if orjson is not None:
+        return JsonCodec(orjson.loads, orjson.dumps)
+    return JsonCodec()
@@ -0,0 +1,187 @@
+import asyncio
+import gzip
+import json
+import os
+
+from aiosparkapi.api.messages import RoomMessage
+from aiosparkapi.baseresponse import BaseResponse
+from aiosparkapi.codec import default_codec
+from aiosparkapi.requests import Checkpoint
+
+
+def _compact_dumps(data):
+    return json.dumps(data, separators=(',', ':'))
+
+
+def _document(item):
+    if isinstance(item, RoomMessage):
+        document = dict(item.message._result)
+        document['roomId'] = item.roomId
+        return document
+    if isinstance(item, BaseResponse):
+        return item._result
+    return item
+
+
+def _default_dumps():
+    codec = default_codec()
+    if codec.dumps is json.dumps:
+        return _compact_dumps
+    return codec.dumps
+
+
+class NdjsonExporter:
+    '''Writes the items of a listing to a file, one JSON document per line.
+
+    The items are written in batches, with the encoding, compression and
+    writing done in an executor, so the event loop is not blocked. At most
+    one batch is written while the next is collected, which bounds the
+    memory used however long the listing is.
+
+    After every batch, the checkpoint of the listing and the size of the
+    file are saved next to it, in path + '.checkpoint'. If the export is
+    interrupted, the listing can be resumed from checkpoint(), and export
+    with resume=True continues the file after the last complete batch. The
+    saved checkpoint is removed when an export completes:
+
+        exporter = NdjsonExporter('people.jsonl.gz', compress=True)
+        checkpoint = exporter.checkpoint()
+        if checkpoint is None:
+            people = await api.people.list()
+        else:
+            people = await api.people.resume(checkpoint)
+        await exporter.export(people, resume=checkpoint is not None)
+
+    Args:
+        path(str): The file to write.
+        compress(bool): Compress the file with gzip. Every batch is written
+            as a gzip member, which gzip readers read as one file.
+        batch_size(int): Number of items written at once.
+        json_codec(JsonCodec): Encodes the items. By default, orjson if it
+            is installed, and compact json otherwise.
+    '''
+
+    def __init__(self, path, *, compress=False, batch_size=1000,
+                 json_codec=None):
+        assert batch_size > 0
+        self._path = path
+        self._checkpoint_path = path + '.checkpoint'
+        self._compress = compress
+        self._batch_size = batch_size
+        if json_codec is None:
+            self._dumps = _default_dumps()
+        else:
+            self._dumps = json_codec.dumps
+        self.count = 0
+
+    def _read_state(self):
+        try:
+            with open(self._checkpoint_path) as checkpoint_file:
+                return json.load(checkpoint_file)
+        except FileNotFoundError:
+            return None
+
+    def checkpoint(self):
+        '''Get where an interrupted export got to.
+
+        Returns:
+            Checkpoint: To resume the listing from, or None if there is no
+                export to resume.
+        '''
+        state = self._read_state()
+        if state is None or state['checkpoint'] is None:
+            return None
+        return Checkpoint(**state['checkpoint'])
+
+    def _encode(self, items):
+        lines = []
+        for item in items:
+            line = self._dumps(item)
+            if isinstance(line, str):
+                line = line.encode('utf-8')
+            lines.append(line)
+        data = b'\n'.join(lines) + b'\n'
+        if self._compress:
+            data = gzip.compress(data)
+        return data
+
+    def _remove_state(self):
+        if os.path.exists(self._checkpoint_path):
+            os.remove(self._checkpoint_path)
+
+    def _open(self, resume):
+        state = self._read_state() if resume else None
+        if state is None:
+            self.count = 0
+            self._remove_state()
+            return open(self._path, 'wb')
+
+        self.count = state['count']
+        output = open(self._path, 'r+b')
+        output.truncate(state['offset'])
+        output.seek(state['offset'])
+        return output
+
+    def _write(self, output, items, checkpoint):
+        if items:
+            output.write(self._encode(items))
+            output.flush()
+            os.fsync(output.fileno())
+        self.count += len(items)
+        if checkpoint is not None:
+            self._save_state(output.tell(), checkpoint)
+
+    def _save_state(self, offset, checkpoint):
+        state = {
+            'checkpoint': checkpoint._asdict(),
+            'offset': offset,
+            'count': self.count,
+        }
+        temporary = self._checkpoint_path + '.tmp'
+        with open(temporary, 'w') as checkpoint_file:
+            json.dump(state, checkpoint_file)
+        os.replace(temporary, self._checkpoint_path)
+
+    async def export(self, iterator, *, resume=False):
+        '''Write the items of a listing to the file.
+
+        Args:
+            iterator: A listing, like the result of People.list, or a
+                MessageExport, whose messages are written with the roomId
+                they were listed from. Only listings with a checkpoint
+                method, unlike a MessageExport, can be resumed.
+            resume(bool): Continue the file of an interrupted export, after
+                its last complete batch. iterator must be resumed from
+                checkpoint(). Otherwise, the file is written from the start.
+
+        Returns:
+            int: The number of items in the file.
+        '''
+        loop = asyncio.get_event_loop()
+        checkpoint = getattr(iterator, 'checkpoint', None)
+        output = await loop.run_in_executor(None, self._open, resume)
+        writing = None
+        try:
+            batch = []
+            async for item in iterator:
+                batch.append(_document(item))
+                if len(batch) < self._batch_size:
+                    continue
+
+                if writing is not None:
+                    await writing
+                writing = loop.run_in_executor(
+                    None, self._write, output, batch,
+                    checkpoint() if checkpoint else None)
+                batch = []
+
+            if writing is not None:
+                await writing
+                writing = None
+            await loop.run_in_executor(None, self._write, output, batch, None)
+        finally:
+            if writing is not None:
+                await asyncio.wait([writing])
+            await loop.run_in_executor(None, output.close)
+        await loop.run_in_executor(None, self._remove_state)
+        return self.count
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    '''Allows on average `rate` operations per second, with bursts of up to
+    `capacity` operations.
+
+    Tokens are reserved rather than waited for, so concurrent callers are
+    served in the order they asked and no lock is needed.
+    '''
+
+    def __init__(self, rate, capacity=None):
+        assert rate > 0
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    @property
+    def tokens(self):
+        self._refill()
+        return self._tokens
+
+    def reserve(self):
+        '''Take one token.
+
+        Returns:
+            float: Seconds to wait before the token may be used.
+        '''
+        self._refill()
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0
+        return -self._tokens / self.rate
+
+
+class RateLimiter:
+    '''Client side rate limiter consulted by Requests before every request.
+
+    One limiter represents the quota of a single access token, so share the
+    same instance between everything using that token. Every request takes
+    a token from the global bucket, and from the bucket of its endpoint if
+    one is configured.
+
+    Args:
+        rate(float): Requests per second allowed for the token.
+        capacity(float): Largest burst allowed for the token. Defaults to
+            `rate`.
+        endpoints(dict): Stricter limits for single endpoints. Keys are
+            either a resource name, like 'messages', or a (method, resource)
+            tuple, like ('POST', 'messages'). Values are (rate, capacity)
+            tuples.
+    '''
+
+    def __init__(self, rate, capacity=None, *, endpoints=None):
+        self._bucket = TokenBucket(rate, capacity)
+        self._endpoints = {}
+        for key, limits in (endpoints or {}).items():
+            self._endpoints[key] = TokenBucket(*limits)
+
+    def _endpoint_bucket(self, method, resource):
+        bucket = self._endpoints.get((method, resource))
+        if bucket is None:
+            bucket = self._endpoints.get(resource)
+        return bucket
+
+    async def acquire(self, method, resource):
+        delay = self._bucket.reserve()
+        bucket = self._endpoint_bucket(method, resource)
+        if bucket is not None:
+            delay = max(delay, bucket.reserve())
+        if delay > 0:
+            await asyncio.sleep(delay)
@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+
+from aiohttp import web
+
+from aiosparkapi.api.webhooks import WebhookEvent
+from aiosparkapi.codec import default_codec
+
+
+logger = logging.getLogger(__name__)
+
+
+def signature(secret, body):
+    '''The X-Spark-Signature of a webhook body, sent with the secret.'''
+    return hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+
+
+class WebhookReceiver:
+    '''Receives webhook events, and dispatches them to handlers.
+
+    Events are acknowledged as soon as they are queued, and handled by a
+    fixed number of workers. When the queue is full, new requests wait for
+    room in it, which slows down the sender instead of using more memory.
+
+        receiver = WebhookReceiver(secret='my secret')
+
+        async def on_message(event):
+            message = event.data
+            ...
+
+        receiver.on('messages', 'created', on_message)
+        web.run_app(receiver.make_app('/webhooks'))
+
+    Args:
+        secret(str): The secret the webhooks were created with. Events
+            without a matching X-Spark-Signature are rejected.
+        workers(int): Number of events handled at once.
+        queue_size(int): Number of events waiting to be handled.
+        json_codec(JsonCodec): Decodes the events.
+    '''
+
+    def __init__(self, *, secret=None, workers=10, queue_size=1000,
+                 json_codec=None):
+        assert workers > 0
+        self._secret = secret
+        self._workers = workers
+        self._queue_size = queue_size
+        self._codec = json_codec or default_codec()
+        self._handlers = []
+        self._queue = None
+        self._tasks = []
+
+        self.received = 0
+        self.rejected = 0
+        self.handled = 0
+        self.failed = 0
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def on(self, resource, event, handler):
+        '''Call handler with every WebhookEvent for resource and event.
+
+        Args:
+            resource(str): Like 'messages', or None for all resources.
+            event(str): Like 'created', or None for all events.
+            handler(coroutine function): Called with the WebhookEvent.
+        '''
+        self._handlers.append((resource, event, handler))
+
+    def _handlers_for(self, event):
+        return [handler for resource, name, handler in self._handlers
+                if resource in (None, event.resource) and
+                name in (None, event.event)]
+
+    def _verify(self, request, body):
+        if self._secret is None:
+            return True
+        expected = signature(self._secret, body)
+        received = request.headers.get('X-Spark-Signature', '')
+        return hmac.compare_digest(expected, received.lower())
+
+    async def handle(self, request):
+        '''aiohttp request handler for the target url of the webhooks.'''
+        body = await request.read()
+        if not self._verify(request, body):
+            self.rejected += 1
+            return web.Response(status=403)
+
+        try:
+            payload = self._codec.loads(body)
+        except ValueError:
+            payload = None
+        if (not isinstance(payload, dict) or
+                'resource' not in payload or
+                'event' not in payload):
+            self.rejected += 1
+            return web.Response(status=400)
+
+        self.received += 1
+        await self._queue.put(WebhookEvent(payload))
+        return web.Response(status=204)
+
+    async def _work(self):
+        while True:
+            event = await self._queue.get()
+            try:
+                for handler in self._handlers_for(event):
+                    await handler(event)
+                self.handled += 1
+            except Exception:
+                self.failed += 1
+                logger.exception(
+                    'Failed handling %s %s event %s',
+                    event.resource,
+                    event.event,
+                    event._result.get('id'))
+            finally:
+                self._queue.task_done()
+
+    async def start(self):
+        '''Start the workers. Must be called before receiving events.'''
+        self._queue = asyncio.Queue(maxsize=self._queue_size)
+        self._tasks = [asyncio.ensure_future(self._work())
+                       for _ in range(self._workers)]
+
+    async def stop(self):
+        '''Handle the queued events, and stop the workers.'''
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _on_startup(self, app):
+        await self.start()
+
+    async def _on_cleanup(self, app):
+        await self.stop()
+
+    def add_route(self, app, path):
+        '''Receive events on path of an aiohttp application, starting and
+        stopping the workers with it.'''
+        app.router.add_route('POST', path, self.handle)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+
+    def make_app(self, path='/'):
+        '''Create an aiohttp application receiving events on path.'''
+        app = web.Application()
+        self.add_route(app, path)
+        return app
+
+
+class _Batch:
+    '''Collects keys asked for within a window, and fetches each of them
+    once, a bounded number at a time.'''
+
+    def __init__(self, fetch, window, concurrency):
+        self._fetch = fetch
+        self._window = window
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._pending = {}
+        self._batch = []
+        self._flush_handle = None
+
+        self.requested = 0
+        self.fetched = 0
+
+    async def get(self, key):
+        self.requested += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_event_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            self._batch.append(key)
+            if self._flush_handle is None:
+                self._flush_handle = loop.call_later(
+                    self._window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        self._flush_handle = None
+        batch, self._batch = self._batch, []
+        for key in batch:
+            asyncio.ensure_future(self._resolve(key))
+
+    async def _resolve(self, key):
+        future = self._pending[key]
+        try:
+            async with self._semaphore:
+                self.fetched += 1
+                result = await self._fetch(key)
+        except Exception as exception:
+            future.set_exception(exception)
+            # Retrieved here, so failures nobody waits for are not logged
+            future.exception()
+        else:
+            future.set_result(result)
+        finally:
+            del self._pending[key]
+
+
+class MessageEnricher:
+    '''Fetches the messages, and optionally their senders, of webhook events.
+
+    Events for messages only contain ids. The ids asked for within a short
+    window are fetched together, concurrently and only once each, which
+    costs a few milliseconds of latency, but saves the duplicate requests
+    of a burst of events.
+
+        enricher = MessageEnricher(api.messages, api.people)
+
+        async def on_message(event, message, person):
+            ...
+
+        receiver.on('messages', 'created', enricher.handler(on_message))
+
+    Args:
+        messages(Messages): Used to get the messages.
+        people(People): Used to get the senders. If None, senders are not
+            fetched.
+        window(float): Seconds to collect ids before fetching them.
+        concurrency(int): Number of messages, and of people, fetched at
+            once.
+    '''
+
+    def __init__(self, messages, people=None, *, window=0.01,
+                 concurrency=10):
+        self._messages = _Batch(messages.get, window, concurrency)
+        self._people = None
+        if people is not None:
+            self._people = _Batch(people.get, window, concurrency)
+
+    @property
+    def requested(self):
+        '''Number of messages and people asked for.'''
+        return self._messages.requested + (
+            self._people.requested if self._people else 0)
+
+    @property
+    def fetched(self):
+        '''Number of messages and people fetched from Spark.'''
+        return self._messages.fetched + (
+            self._people.fetched if self._people else 0)
+
+    async def message(self, message_id):
+        '''Get a message, batched with the other messages asked for.'''
+        return await self._messages.get(message_id)
+
+    async def person(self, person_id):
+        '''Get a person, batched with the other people asked for.'''
+        assert self._people is not None
+        return await self._people.get(person_id)
+
+    def handler(self, handler):
+        '''Wrap a handler to be called with the message of the event.
+
+        Args:
+            handler(coroutine function): Called with the WebhookEvent and
+                the Message. If people were given, also with the Person
+                who sent the message.
+
+        Returns:
+            coroutine function: A handler for WebhookReceiver.on.
+        '''
+
+        async def enriched(event):
+            message = await self.message(event.data.id)
+            if self._people is None:
+                return await handler(event, message)
+            person = await self.person(message.personId)
+            return await handler(event, message, person)
+
+        return enriched
@@ -1,7 +1,17 @@
-import json
+import asyncio
+import collections
+import functools
+import os
+import random
+import time
+import weakref
+
 import aiohttp
 
 import aiosparkapi.exceptions as exceptions
+from aiosparkapi.codec import default_codec
+from aiosparkapi.upload import Upload
+from aiosparkapi.scheduler import Priority, RequestScheduler
 
 
 def _add_parameters_to_path(path, parameters):
@@ -19,7 +29,11 @@ def _create_multipart(arguments):
     for key, value in arguments.items():
         filename = None
         content_type = None
-        if isinstance(value, dict):
+        if isinstance(value, Upload):
+            filename = value.name
+            content_type = value.content_type
+            value = value.open()
+        elif isinstance(value, dict):
             filename = value['name']
             value = value['content']
 
@@ -31,30 +45,47 @@ def _create_multipart(arguments):
     return data
 
 
-async def _validate_response(response):
+def _get_retry_after(response):
+    retry_after = response.headers.get('retry-after', '3600')
+    try:
+        return int(retry_after)
+    except ValueError:
+        return float(retry_after)
+
+
+async def _read_error(response, codec):
+    body = await response.read()
+    if not body.strip():
+        return {}
+    try:
+        return codec.loads(body)
+    except ValueError:
+        return await response.text()
+
+
+async def _validate_response(response, codec):
         if response.status == 401:
             raise exceptions.Unauthorized()
 
         if response.status == 404:
-            raise exceptions.NotFound(await response.json())
+            raise exceptions.NotFound(await _read_error(response, codec))
 
         if response.status == 429:
-            raise exceptions.TooManyRequests(
-                int(response.headers.get('retry-after', '3600')))
+            raise exceptions.TooManyRequests(_get_retry_after(response))
 
         if response.status >= 500:
             raise exceptions.ServerError(
                 response.status,
-                await response.json())
+                await _read_error(response, codec))
 
         if response.status >= 400:
             raise exceptions.InvalidRequest(
                 response.status,
-                await response.json())
+                await _read_error(response, codec))
 
         raise exceptions.SparkApiException(
             response.status,
-            await response.json(),
+            await _read_error(response, codec),
             'Failed request')
 
 
@@ -66,111 +97,635 @@ def _get_next_link(request):
     return link.split()[0][1:-2]
 
 
-class AsyncGenerator:
+class PauseGate:
+    '''Holds back every request made with one access token while the
+    Spark service has asked us to slow down.
+
+    When a request is answered with 429, the gate is closed for the
+    Retry-After period. Every coroutine waiting on the gate parks until it
+    reopens and then resumes after a random jitter, so the requests are
+    spread out instead of hitting the service at the same instant.
+    '''
+
+    def __init__(self):
+        self._resume_at = 0
+
+    @property
+    def paused(self):
+        return self._resume_at > time.monotonic()
+
+    def pause(self, delay):
+        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    async def wait(self, jitter=0):
+        if not self.paused:
+            return
+        # Another 429 can extend the pause while sleeping
+        while self.paused:
+            await asyncio.sleep(self._resume_at - time.monotonic())
+        await asyncio.sleep(random.uniform(0, jitter))
+
+
+_pause_gates = weakref.WeakValueDictionary()
 
-    def __init__(self, results, next_link, client, headers):
-        self._client = client
-        self._headers = headers
-        self._set_result(results, next_link)
 
-    def _set_result(self, results, next_link):
+def _get_pause_gate(token):
+    gate = _pause_gates.get(token)
+    if gate is None:
+        gate = PauseGate()
+        _pause_gates[token] = gate
+    return gate
+
+
+class Checkpoint(collections.namedtuple(
+        'Checkpoint', ['resource', 'link', 'offset'])):
+    '''Where an iteration over a listing got to, see Requests.resume.
+
+    Only holds strings and numbers, so it can be stored as JSON, with
+    checkpoint._asdict(), and read back with Checkpoint(**stored).
+
+    Attributes:
+        resource(str): The listed resource, like 'messages'.
+        link(str): The url of the page to continue from, or None if the
+            iteration was done.
+        offset(int): Number of items of that page already iterated over.
+    '''
+
+
+async def _fetch_page(requests, resource, priority, link):
+    response, body = await requests._request(
+        'GET',
+        link,
+        resource=resource,
+        expected=200,
+        priority=priority,
+        operation='list')
+
+    results = requests._codec.loads(body)
+    return results, _get_next_link(response), link
+
+
+async def _prefetch(fetch, link, pages, room):
+    # Holds no reference to the AsyncGenerator, so an abandoned one can be
+    # collected, which stops the prefetching
+    try:
+        while link:
+            await room.acquire()
+            page = await fetch(link)
+            link = page[1]
+            pages.put_nowait((page, None))
+    except Exception as error:
+        pages.put_nowait((None, error))
+
+
+class AsyncGenerator:
+    '''Iterates over the items of a listing, fetching pages as needed.
+
+    With read_ahead set, the following pages are fetched in the background
+    while the current page is consumed. At most read_ahead pages are fetched
+    ahead of the current one, so a slow consumer holds back the fetching.
+    The fetching stops on aclose, or when the generator is garbage
+    collected.
+
+    The following pages are fetched with the priority of the first page,
+    but never before Priority.PAGING.
+    '''
+
+    def __init__(self, results, next_link, requests, resource, read_ahead=0,
+                 link=None, priority=Priority.NORMAL):
+        self._requests = requests
+        self._resource = resource
+        self._read_ahead = read_ahead
+        self._priority = max(priority, Priority.PAGING)
+        self._pages = None
+        self._room = None
+        self._prefetcher = None
+        self._set_result(results, next_link, link)
+
+    def __del__(self):
+        if self._prefetcher is not None and not self._prefetcher.done():
+            self._prefetcher.cancel()
+
+    def _set_result(self, results, next_link, link):
         self._results = results['items']
         self._index = 0
         self._length = len(self._results)
         self._next_link = next_link
+        self._link = link
+
+    def _fetch_page(self, link):
+        return _fetch_page(
+            self._requests, self._resource, self._priority, link)
+
+    def _start_prefetch(self):
+        self._pages = asyncio.Queue()
+        self._room = asyncio.Semaphore(self._read_ahead)
+        fetch = functools.partial(
+            _fetch_page, self._requests, self._resource, self._priority)
+        self._prefetcher = asyncio.ensure_future(
+            _prefetch(fetch, self._next_link, self._pages, self._room))
+
+    async def _next_page(self):
+        if not self._read_ahead:
+            return await self._fetch_page(self._next_link)
+
+        page, error = await self._pages.get()
+        if error is not None:
+            self._next_link = None
+            raise error
+        self._room.release()
+        return page
+
+    def checkpoint(self):
+        '''Get where the iteration got to, so it can be resumed later.
+
+        Returns:
+            Checkpoint: The page being iterated over, and how far into it.
+        '''
+        if self._index == self._length:
+            return Checkpoint(self._resource, self._next_link, 0)
+        return Checkpoint(self._resource, self._link, self._index)
 
-    async def __aiter__(self):
+    def __aiter__(self):
         return self
 
     async def __anext__(self):
-        if self._index == self._length:
+        if self._read_ahead and self._prefetcher is None and self._next_link:
+            self._start_prefetch()
+
+        while self._index == self._length:
             if not self._next_link:
                 raise StopAsyncIteration
-            response = await self._client.get(
-                self._next_link,
-                headers=self._headers)
-            if not response.status == 200:
-                await _validate_response(response)
-
-            results = await response.json()
-            self._set_result(results, _get_next_link(response))
+            self._set_result(*await self._next_page())
 
         result = self._results[self._index]
         self._index += 1
         return result
 
+    async def aclose(self):
+        '''Stop fetching pages in the background.'''
+        self._next_link = None
+        if self._prefetcher is not None and not self._prefetcher.done():
+            self._prefetcher.cancel()
+            try:
+                await self._prefetcher
+            except asyncio.CancelledError:
+                pass
+
+
+class FileInfo(collections.namedtuple(
+        'FileInfo', ['filename', 'size', 'content_type'])):
+    '''Details about a file attached to a message.
+
+    Attributes:
+        filename(str): The name of the file, or None if not known.
+        size(int): The size in bytes, or None if not known.
+        content_type(str): The MIME type of the file.
+    '''
+
+
+def _get_file_info(response):
+    filename = None
+    if response.content_disposition is not None:
+        filename = response.content_disposition.filename
+    return FileInfo(filename, response.content_length, response.content_type)
+
+
+class Download:
+    '''Streams the content of a file, see Requests.download.'''
+
+    def __init__(self, requests, url, chunk_size, priority):
+        self._requests = requests
+        self._url = url
+        self._chunk_size = chunk_size
+        self._priority = priority
+        self._response = None
+        self.info = None
+
+    async def __aenter__(self):
+        self._response = await self._requests._open(
+            'GET',
+            self._url,
+            resource='contents',
+            expected=200,
+            priority=self._priority,
+            operation='download')
+        self.info = _get_file_info(self._response)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._requests._release(self._response)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await self._response.content.read(self._chunk_size)
+        if not chunk:
+            raise StopAsyncIteration
+        return chunk
+
+    async def save(self, path):
+        '''Write the content to a file.
+
+        Args:
+            path(str): The file to write to. If it is a directory, the file
+                is written into it, with the name given by the server.
+
+        Returns:
+            str: The path of the written file.
+        '''
+        if os.path.isdir(path):
+            filename = os.path.basename(self.info.filename or '')
+            path = os.path.join(path, filename or 'file')
+
+        loop = asyncio.get_event_loop()
+        with open(path, 'wb') as output:
+            async for chunk in self:
+                await loop.run_in_executor(None, output.write, chunk)
+        return path
+
 
 class Requests:
 
-    def __init__(self, token, client, baseurl=''):
+    def __init__(self,
+                 token,
+                 client,
+                 baseurl='',
+                 *,
+                 max_retries=3,
+                 retry_jitter=1.0,
+                 max_retry_after=300,
+                 rate_limiter=None,
+                 max_in_flight=None,
+                 timeouts=None,
+                 read_ahead=0,
+                 cache=None,
+                 json_codec=None):
+        '''Send authenticated requests to the Spark api
+
+        Args:
+            token(str): The access token used for every request.
+            client(aiohttp.ClientSession): The session to send requests on.
+            baseurl(str): Prefix for all resource paths.
+            max_retries(int): How many times a request answered with 429 is
+                retried before TooManyRequests is raised.
+            retry_jitter(float): Upper bound, in seconds, of the random
+                delay added after a pause, to stagger resuming requests.
+            max_retry_after(float): Retry-After values longer than this
+                raise TooManyRequests instead of waiting.
+            rate_limiter(RateLimiter): Consulted before every request, to
+                stay within the quota of the token. Anything with an async
+                `acquire(method, resource)` method can be used.
+            max_in_flight(int): Largest number of concurrent requests.
+                Requests above the limit are queued by priority.
+            timeouts(dict): Timeouts, in seconds or as
+                aiohttp.ClientTimeout, for single operations. Keys are
+                'list', 'get', 'create', 'update', 'delete' and
+                'download'. Operations without a timeout use the timeout of
+                the session.
+            read_ahead(int): Default number of pages listings fetch ahead
+                of the consumer. 0 fetches a page only when it is needed.
+            cache(ResponseCache): Serves get requests for the resources it
+                caches from memory.
+            json_codec(JsonCodec): Encodes request bodies and decodes
+                responses. Defaults to orjson when it is installed.
+        '''
         self._client = client
         self._headers = {
             'Authorization': 'Bearer {}'.format(token),
         }
         self._baseurl = baseurl
-
-    async def list(self, path, parameters=None):
-        path = '{}/{}'.format(self._baseurl, path)
-        path = _add_parameters_to_path(path, parameters)
-        response = await self._client.get(path, headers=self._headers)
-
-        if not response.status == 200:
-            await _validate_response(response)
-
-        results = await response.json()
+        self._max_retries = max_retries
+        self._retry_jitter = retry_jitter
+        self._max_retry_after = max_retry_after
+        self._pause_gate = _get_pause_gate(token)
+        self._rate_limiter = rate_limiter
+        self._scheduler = RequestScheduler(max_in_flight)
+        self._timeouts = {}
+        for operation, timeout in (timeouts or {}).items():
+            if not isinstance(timeout, aiohttp.ClientTimeout):
+                timeout = aiohttp.ClientTimeout(total=timeout)
+            self._timeouts[operation] = timeout
+        self._read_ahead = read_ahead
+        self._cache = cache
+        self._pending_gets = {}
+        self._generations = {}
+        self._codec = json_codec or default_codec()
+        self.coalesced_gets = 0
+
+    @property
+    def pause_gate(self):
+        return self._pause_gate
+
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+    @property
+    def cache(self):
+        return self._cache
+
+    def _cached(self, path):
+        return self._cache is not None and self._cache.caches(path)
+
+    def _invalidate(self, path, resource_id):
+        '''Drop a cached resource, and keep a get of it in flight from
+        caching what it was answered with.'''
+        if not self._cached(path):
+            return
+        self._cache.invalidate(path, resource_id)
+        key = (path, resource_id)
+        if key in self._pending_gets:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    async def _open(self, method, url, *, resource, expected,
+                    headers=None, data=None, priority=Priority.NORMAL,
+                    operation=None, max_retries=None):
+        '''Send a request, retrying it while it is answered with 429.
+
+        The response is returned unread, holding both its connection and a
+        slot of the scheduler. Pass it to _release when done with it.
+        '''
+        if headers is None:
+            headers = self._headers
+        if max_retries is None:
+            max_retries = self._max_retries
+
+        kwargs = {}
+        if operation in self._timeouts:
+            kwargs['timeout'] = self._timeouts[operation]
+
+        retries = 0
+        while True:
+            await self._pause_gate.wait(self._retry_jitter)
+
+            await self._scheduler.acquire(priority)
+            try:
+                if self._rate_limiter is not None:
+                    await self._rate_limiter.acquire(method, resource)
+
+                # A 429 can have closed the gate while queued for the slot
+                if self._pause_gate.paused:
+                    self._scheduler.release()
+                    continue
+
+                response = await self._client.request(
+                    method,
+                    url,
+                    headers=headers,
+                    data=data() if callable(data) else data,
+                    **kwargs)
+            except BaseException:
+                self._scheduler.release()
+                raise
+
+            if response.status == expected:
+                return response
+
+            try:
+                if response.status == 429 and retries < max_retries:
+                    retry_after = _get_retry_after(response)
+                    if retry_after <= self._max_retry_after:
+                        self._pause_gate.pause(retry_after)
+                        retries += 1
+                        continue
+
+                await _validate_response(response, self._codec)
+            finally:
+                self._release(response)
+
+    def _release(self, response):
+        response.release()
+        self._scheduler.release()
+
+    async def _request(self, method, url, **kwargs):
+        '''Send a request, like _open.
+
+        Returns the response and its body. The connection of the response
+        is already returned to the pool.
+        '''
+        response = await self._open(method, url, **kwargs)
+        try:
+            body = await response.read()
+        finally:
+            self._release(response)
+        return response, body
+
+    async def head(self, url, *, priority=Priority.NORMAL):
+        '''Get the name, size and type of a file, without downloading it.
+
+        Args:
+            url(str): The content url, as listed in Message.files.
+
+        Returns:
+            FileInfo: Details about the file.
+        '''
+        response, _ = await self._request(
+            'HEAD',
+            url,
+            resource='contents',
+            expected=200,
+            priority=priority,
+            operation='download')
+        return _get_file_info(response)
+
+    def download(self, url, *, chunk_size=256 * 1024,
+                 priority=Priority.NORMAL):
+        '''Stream a file, using the authorization of this client.
+
+        Use the returned Download as an async context manager, and iterate
+        over it for the content, in chunks:
+
+            async with requests.download(url) as download:
+                async for chunk in download:
+                    ...
+
+        Args:
+            url(str): The content url, as listed in Message.files.
+            chunk_size(int): Largest number of bytes in every chunk.
+        '''
+        return Download(self, url, chunk_size, priority)
+
+    async def list(self, path, parameters=None, *,
+                   priority=Priority.NORMAL, read_ahead=None):
+        url = '{}/{}'.format(self._baseurl, path)
+        url = _add_parameters_to_path(url, parameters)
+        response, body = await self._request(
+            'GET',
+            url,
+            resource=path,
+            expected=200,
+            priority=priority,
+            operation='list')
+
+        results = self._codec.loads(body)
         return AsyncGenerator(
             results,
             _get_next_link(response),
-            self._client, self._headers)
+            self,
+            path,
+            self._read_ahead if read_ahead is None else read_ahead,
+            link=url,
+            priority=priority)
+
+    async def resume(self, checkpoint, *, priority=Priority.NORMAL,
+                     read_ahead=None):
+        '''Continue iterating over a listing from a checkpoint.
+
+        The page the checkpoint was taken on is fetched again, and the items
+        already iterated over are skipped. Items added to or removed from
+        the page since then can shift the offset.
+
+        Args:
+            checkpoint(Checkpoint): From AsyncGenerator.checkpoint.
+
+        Returns:
+            AsyncGenerator: Yields the remaining items of the listing.
+        '''
+        resource, link, offset = checkpoint
+        read_ahead = self._read_ahead if read_ahead is None else read_ahead
+        if not link:
+            return AsyncGenerator({'items': []}, None, self, resource)
+
+        response, body = await self._request(
+            'GET',
+            link,
+            resource=resource,
+            expected=200,
+            priority=priority,
+            operation='list')
+
+        generator = AsyncGenerator(
+            self._codec.loads(body),
+            _get_next_link(response),
+            self,
+            resource,
+            read_ahead,
+            link=link,
+            priority=priority)
+        generator._index = min(offset, generator._length)
+        return generator
+
+    async def _get(self, path, fetch_id, priority):
+        key = (path, fetch_id)
+        generation = self._generations.get(key, 0)
+        url = '{}/{}/{}'.format(self._baseurl, path, fetch_id)
+        _, body = await self._request(
+            'GET',
+            url,
+            resource=path,
+            expected=200,
+            priority=priority,
+            operation='get')
+        result = self._codec.loads(body)
+
+        # An update or delete during the request can have been answered
+        # before it, so the result may already be stale
+        if (self._cached(path) and
+                self._generations.get(key, 0) == generation):
+            self._cache.set(path, fetch_id, result)
+        return result
 
-    async def get(self, path, fetch_id):
-        path = '{}/{}/{}'.format(self._baseurl, path, fetch_id)
-        response = await self._client.get(path, headers=self._headers)
+    def _get_done(self, key, task):
+        del self._pending_gets[key]
+        self._generations.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    async def get(self, path, fetch_id, *, priority=Priority.NORMAL):
+        '''Get a single resource by id.
+
+        Concurrent gets of the same resource share one request, counted by
+        coalesced_gets.
+        '''
+        if self._cached(path):
+            result = self._cache.get(path, fetch_id)
+            if result is not None:
+                return result
+
+        key = (path, fetch_id)
+        task = self._pending_gets.get(key)
+        if task is not None:
+            self.coalesced_gets += 1
+        else:
+            task = asyncio.ensure_future(self._get(path, fetch_id, priority))
+            self._pending_gets[key] = task
+            task.add_done_callback(functools.partial(self._get_done, key))
 
-        if response.status == 200:
-            return await response.json()
-        await _validate_response(response)
+        return await asyncio.shield(task)
 
-    async def create(self, path, arguments, *, multipart=False):
-        path = '{}/{}'.format(self._baseurl, path)
-        headers = self._headers
+    async def create(self, path, arguments, *, multipart=False,
+                     priority=Priority.NORMAL):
+        url = '{}/{}'.format(self._baseurl, path)
+        headers = dict(self._headers)
         data = None
+        max_retries = None
+        uploads = []
         if not multipart:
             headers['content-type'] = 'application/json'
-            data = json.dumps(arguments)
+            data = self._codec.dumps(arguments)
         else:
-            data = _create_multipart(arguments)
-
-        response = await self._client.post(
-            path,
-            headers=headers,
-            data=data)
-
-        if response.status == 200:
-            return await response.json()
-        await _validate_response(response)
-
-    async def update(self, path, update_id, arguments):
-        path = '{}/{}/{}'.format(self._baseurl, path, update_id)
-        headers = self._headers
+            uploads = [value for value in arguments.values()
+                       if isinstance(value, Upload)]
+            if not all(upload.replayable for upload in uploads):
+                max_retries = 0
+
+            def data():
+                return _create_multipart(arguments)
+
+        try:
+            _, body = await self._request(
+                'POST',
+                url,
+                resource=path,
+                expected=200,
+                headers=headers,
+                data=data,
+                priority=priority,
+                operation='create',
+                max_retries=max_retries)
+        finally:
+            for upload in uploads:
+                upload.close()
+        return self._codec.loads(body)
+
+    async def update(self, path, update_id, arguments, *,
+                     priority=Priority.NORMAL):
+        self._invalidate(path, update_id)
+
+        url = '{}/{}/{}'.format(self._baseurl, path, update_id)
+        headers = dict(self._headers)
         headers['content-type'] = 'application/json'
 
-        response = await self._client.put(
-            path,
+        _, body = await self._request(
+            'PUT',
+            url,
+            resource=path,
+            expected=200,
             headers=headers,
-            data=json.dumps(arguments))
+            data=self._codec.dumps(arguments),
+            priority=priority,
+            operation='update')
+        result = self._codec.loads(body)
+
+        self._invalidate(path, update_id)
+        if self._cached(path):
+            self._cache.set(path, update_id, result)
+        return result
 
-        if response.status == 200:
-            return await response.json()
-        await _validate_response(response)
+    async def delete(self, path, delete_id, *, priority=Priority.NORMAL):
+        self._invalidate(path, delete_id)
 
-    async def delete(self, path, delete_id):
-        path = '{}/{}/{}'.format(self._baseurl, path, delete_id)
+        url = '{}/{}/{}'.format(self._baseurl, path, delete_id)
 
-        response = await self._client.delete(
-            path,
-            headers=self._headers)
+        await self._request(
+            'DELETE',
+            url,
+            resource=path,
+            expected=204,
+            priority=priority,
+            operation='delete')
 
-        if response.status == 204:
-            return True
-        await _validate_response(response)
+        self._invalidate(path, delete_id)
+        return True
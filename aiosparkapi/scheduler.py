@@ -0,0 +1,108 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class Priority:
+    '''Request priorities, lower values are sent first.'''
+    HIGH = 0
+    NORMAL = 10
+    PAGING = 20
+    BULK = 30
+
+
+class _Slot:
+
+    def __init__(self, scheduler, priority):
+        self._scheduler = scheduler
+        self._priority = priority
+
+    async def __aenter__(self):
+        await self._scheduler.acquire(self._priority)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._scheduler.release()
+
+
+class RequestScheduler:
+    '''Limits the number of requests in flight, and queues the rest by
+    priority.
+
+    Requests with the same priority are sent in the order they were queued.
+
+    Args:
+        max_in_flight(int): Largest number of concurrent requests. None
+            means no limit, but the scheduler still keeps statistics.
+    '''
+
+    def __init__(self, max_in_flight=None):
+        assert max_in_flight is None or max_in_flight > 0
+        self._max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._waiters = []
+        self._order = itertools.count()
+
+        self.requests = 0
+        self.queued = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    @property
+    def max_in_flight(self):
+        return self._max_in_flight
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    @property
+    def average_wait_time(self):
+        if not self.requests:
+            return 0.0
+        return self.total_wait_time / self.requests
+
+    def _has_capacity(self):
+        return (self._max_in_flight is None or
+                self._in_flight < self._max_in_flight)
+
+    async def acquire(self, priority=Priority.NORMAL):
+        start = time.monotonic()
+        if self._has_capacity() and not self._waiters:
+            self._in_flight += 1
+        else:
+            future = asyncio.get_event_loop().create_future()
+            entry = (priority, next(self._order), future)
+            heapq.heappush(self._waiters, entry)
+            self.queued += 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self.release()
+                elif entry in self._waiters:
+                    # release() drops cancelled waiters it comes across
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                raise
+
+        waited = time.monotonic() - start
+        self.requests += 1
+        self.total_wait_time += waited
+        self.max_wait_time = max(self.max_wait_time, waited)
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def slot(self, priority=Priority.NORMAL):
+        '''Async context manager holding a request slot while in use.'''
+        return _Slot(self, priority)
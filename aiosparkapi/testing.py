@@ -0,0 +1,391 @@
+import asyncio
+import collections
+import datetime
+import random
+import socket
+
+from aiohttp import web
+
+
+RESOURCES = ['messages', 'people', 'memberships', 'rooms', 'webhooks']
+
+_required = {
+    'messages': [],
+    'people': ['emails'],
+    'memberships': ['roomId'],
+    'rooms': ['title'],
+    'webhooks': ['name', 'targetUrl', 'resource', 'event'],
+}
+
+_paging = ('max', 'cursor')
+
+_filters = {
+    'messages': ('roomId', 'mentionedPeople', 'before', 'beforeMessage'),
+    'people': ('email', 'displayName', 'id', 'orgId'),
+    'memberships': ('roomId', 'personId', 'personEmail'),
+    'rooms': ('teamId', 'type', 'sortBy'),
+    'webhooks': (),
+}
+
+_sort_keys = {
+    'id': 'id',
+    'lastactivity': 'lastActivity',
+    'created': 'created',
+}
+
+
+def _error(status, message):
+    return web.json_response({'message': message}, status=status)
+
+
+class FakeSparkServer:
+    '''An in-process Spark api, for testing and load testing clients.
+
+    Serves messages, people, memberships, rooms and webhooks from memory,
+    with the listings paged by Link headers like the real api. Listings
+    take the filters of the real api, like before and beforeMessage for
+    messages, and answer other parameters with 400. Latency,
+    throttling and server errors can be added to see how a client copes:
+
+        async with FakeSparkServer(latency=0.01, throttle_rate=0.05) as server:
+            server.populate(rooms=10, messages=1000)
+            async with AioSparkApi(access_token='token',
+                                   baseurl=server.url) as api:
+                await api.setup()
+                ...
+
+    The application is also available as app, for the test_client
+    fixture of pytest-aiohttp.
+
+    Args:
+        latency(float or tuple): Seconds to wait before answering, or the
+            (lowest, highest) of a random wait.
+        throttle_rate(float): Part of the requests answered with 429.
+        retry_after(float): Retry-After of the 429 responses.
+        error_rate(float): Part of the requests answered with 503.
+        page_size(int): Items in a page when max is not given.
+        token(str): The only access token accepted. By default, any bearer
+            token is.
+        seed(int): Seed for the random latency and failures.
+    '''
+
+    def __init__(self, *, latency=0, throttle_rate=0, retry_after=1,
+                 error_rate=0, page_size=100, token=None, seed=None):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.page_size = page_size
+        self.token = token
+        self._random = random.Random(seed)
+        self._ids = 0
+        self._time = datetime.datetime(2018, 1, 1)
+        self._throttle_next = 0
+        self._runner = None
+        self.url = None
+
+        self.resources = collections.OrderedDict(
+            (resource, collections.OrderedDict()) for resource in RESOURCES)
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.calls = collections.Counter()
+
+        self.me = self.add(
+            'people',
+            emails=['bot@example.com'],
+            displayName='Bot',
+            type='bot')
+        self.app = self._create_app()
+
+    def _next_id(self, resource):
+        self._ids += 1
+        return '{}-{}'.format(resource, self._ids)
+
+    def _timestamp(self):
+        return self._time.strftime('%Y-%m-%dT%H:%M:%S.%f')[:23] + 'Z'
+
+    def _now(self):
+        self._time += datetime.timedelta(milliseconds=1)
+        return self._timestamp()
+
+    def _defaults(self, resource, fields):
+        if resource == 'people':
+            email = fields['emails'][0]
+            name = fields.get('displayName', email.split('@')[0])
+            return {
+                'displayName': name,
+                'firstName': name.split()[0],
+                'lastName': name.split()[-1],
+                'avatar': 'https://avatars.example.com/{}'.format(email),
+                'orgId': 'org-1',
+                'lastActivity': self._timestamp(),
+                'status': 'active',
+                'type': 'person',
+            }
+        if resource == 'rooms':
+            return {
+                'type': 'group',
+                'isLocked': False,
+                'lastActivity': self._timestamp(),
+                'creatorId': self.me['id'],
+            }
+        if resource == 'messages':
+            return {
+                'roomType': 'direct' if 'roomId' not in fields else 'group',
+                'roomId': fields.get('roomId', self._next_id('rooms')),
+                'personId': self.me['id'],
+                'personEmail': self.me['emails'][0],
+            }
+        if resource == 'memberships':
+            person = self._person(fields)
+            return {
+                'personId': person['id'],
+                'personEmail': person['emails'][0],
+                'personDisplayName': person['displayName'],
+                'isModerator': False,
+                'isMonitor': False,
+            }
+        if resource == 'webhooks':
+            return {'status': 'active'}
+        return {}
+
+    def _person(self, fields):
+        people = self.resources['people']
+        if fields.get('personId') in people:
+            return people[fields['personId']]
+        email = fields.get('personEmail', 'someone@example.com')
+        for person in people.values():
+            if email in person['emails']:
+                return person
+        return self.add('people', emails=[email])
+
+    def add(self, resource, **fields):
+        '''Add an item, filling in the fields the real api would.
+
+        Args:
+            resource(str): Like 'messages'.
+            fields: The fields of the item, like roomId and text.
+
+        Returns:
+            dict: The added item.
+        '''
+        item = {'id': self._next_id(resource)}
+        item.update(self._defaults(resource, fields))
+        item.update(fields)
+        item['created'] = self._now()
+        self.resources[resource][item['id']] = item
+        return item
+
+    def populate(self, *, rooms=1, messages=0, people=0):
+        '''Add rooms with messages, and people who are members of them.
+
+        Args:
+            rooms(int): Number of rooms.
+            messages(int): Number of messages in every room.
+            people(int): Number of people, all members of every room.
+
+        Returns:
+            list: The ids of the rooms.
+        '''
+        persons = [
+            self.add('people', emails=['person{}@example.com'.format(i)],
+                     displayName='Person {}'.format(i))
+            for i in range(people)]
+        room_ids = []
+        for number in range(rooms):
+            room = self.add('rooms', title='Room {}'.format(number))
+            room_ids.append(room['id'])
+            for person in persons:
+                self.add('memberships', roomId=room['id'],
+                         personId=person['id'])
+            for count in range(messages):
+                self.add('messages', roomId=room['id'],
+                         text='Message {}'.format(count))
+        return room_ids
+
+    def throttle(self, times):
+        '''Answer the next times requests with 429.'''
+        self._throttle_next = times
+
+    def _delay(self):
+        if isinstance(self.latency, (tuple, list)):
+            return self._random.uniform(*self.latency)
+        return self.latency
+
+    def _authorized(self, request):
+        authorization = request.headers.get('Authorization', '')
+        if self.token is not None:
+            return authorization == 'Bearer {}'.format(self.token)
+        return authorization.startswith('Bearer ')
+
+    def _create_app(self):
+
+        @web.middleware
+        async def faults(request, handler):
+            self.requests += 1
+            delay = self._delay()
+            if delay:
+                await asyncio.sleep(delay)
+
+            if not self._authorized(request):
+                return _error(401, 'Unauthorized')
+
+            if (self._throttle_next > 0 or
+                    self._random.random() < self.throttle_rate):
+                self._throttle_next = max(0, self._throttle_next - 1)
+                self.throttled += 1
+                return web.Response(
+                    status=429,
+                    headers={'Retry-After': str(self.retry_after)})
+
+            if self._random.random() < self.error_rate:
+                self.errors += 1
+                return _error(503, 'Service unavailable')
+
+            return await handler(request)
+
+        app = web.Application(middlewares=[faults])
+        resource = '/{resource:' + '|'.join(RESOURCES) + '}'
+        app.router.add_route('GET', '/people/me', self._get_me)
+        app.router.add_route('GET', resource, self._list)
+        app.router.add_route('POST', resource, self._create)
+        app.router.add_route('GET', resource + '/{id}', self._get)
+        app.router.add_route('PUT', resource + '/{id}', self._update)
+        app.router.add_route('DELETE', resource + '/{id}', self._delete)
+        return app
+
+    def _matches(self, item, key, value):
+        if key == 'email':
+            return value in item.get('emails', [])
+        if key == 'id':
+            return item['id'] in value.split(',')
+        if key == 'displayName':
+            return item.get('displayName', '').startswith(value)
+        if key == 'mentionedPeople':
+            mentioned = [self.me['id'] if person == 'me' else person
+                         for person in value.split(',')]
+            return any(person in item.get('mentionedPeople', [])
+                       for person in mentioned)
+        if key == 'before':
+            return item['created'] < value
+        if key == 'beforeMessage':
+            return item['created'] < self.resources['messages'][value][
+                'created']
+        if key == 'sortBy':
+            return True
+        return str(item.get(key)) == value
+
+    async def _list(self, request):
+        resource = request.match_info['resource']
+        self.calls[('list', resource)] += 1
+        query = request.query
+        if resource == 'messages' and 'roomId' not in query:
+            return _error(400, 'roomId is required')
+        for key in query:
+            if key not in _paging and key not in _filters[resource]:
+                return _error(400, 'Unsupported parameter {}'.format(key))
+        before_message = query.get('beforeMessage')
+        if (before_message is not None and
+                before_message not in self.resources['messages']):
+            return _error(400, 'Unknown beforeMessage')
+        if query.get('sortBy', 'id') not in _sort_keys:
+            return _error(400, 'Unknown sortBy')
+
+        items = [
+            item for item in self.resources[resource].values()
+            if all(self._matches(item, key, value)
+                   for key, value in query.items() if key not in _paging)]
+        if resource == 'messages':
+            items.reverse()
+        if 'sortBy' in query:
+            key = _sort_keys[query['sortBy']]
+            items.sort(key=lambda item: item[key], reverse=key != 'id')
+
+        size = int(query.get('max', self.page_size))
+        cursor = int(query.get('cursor', 0))
+        headers = {}
+        if cursor + size < len(items):
+            parameters = dict(query)
+            parameters['cursor'] = str(cursor + size)
+            headers['Link'] = '<{}>; rel="next"'.format(
+                request.url.with_query(parameters))
+
+        return web.json_response(
+            {'items': items[cursor:cursor + size]}, headers=headers)
+
+    async def _get_me(self, request):
+        self.calls[('get', 'people')] += 1
+        return web.json_response(self.me)
+
+    def _find(self, request):
+        resource = request.match_info['resource']
+        return resource, self.resources[resource].get(request.match_info['id'])
+
+    async def _get(self, request):
+        resource, item = self._find(request)
+        self.calls[('get', resource)] += 1
+        if item is None:
+            return _error(404, 'Not found')
+        return web.json_response(item)
+
+    async def _create(self, request):
+        resource = request.match_info['resource']
+        self.calls[('create', resource)] += 1
+        if request.content_type == 'multipart/form-data':
+            fields = {}
+            for key, value in (await request.post()).items():
+                if hasattr(value, 'filename'):
+                    fields.setdefault('files', []).append(value.filename)
+                else:
+                    fields[key] = value
+        else:
+            fields = await request.json()
+
+        if resource == 'messages' and 'toRoomId' in fields:
+            fields['roomId'] = fields.pop('toRoomId')
+
+        missing = [key for key in _required[resource] if key not in fields]
+        if missing:
+            return _error(400, 'Missing {}'.format(', '.join(missing)))
+        return web.json_response(self.add(resource, **fields))
+
+    async def _update(self, request):
+        resource, item = self._find(request)
+        self.calls[('update', resource)] += 1
+        if item is None:
+            return _error(404, 'Not found')
+        item.update(await request.json())
+        return web.json_response(item)
+
+    async def _delete(self, request):
+        resource, item = self._find(request)
+        self.calls[('delete', resource)] += 1
+        if item is None:
+            return _error(404, 'Not found')
+        del self.resources[resource][item['id']]
+        return web.Response(status=204)
+
+    async def start(self, host='127.0.0.1', port=0):
+        '''Start serving, and set url to where the server is.'''
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.SockSite(self._runner, sock).start()
+        self.url = 'http://{}:{}'.format(*sock.getsockname()[:2])
+        return self.url
+
+    async def close(self):
+        '''Stop serving.'''
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
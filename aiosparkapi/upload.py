@@ -0,0 +1,90 @@
+import asyncio
+import mimetypes
+import os
+
+
+class _FileChunks:
+
+    def __init__(self, file, chunk_size):
+        self._file = file
+        self._chunk_size = chunk_size
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await asyncio.get_event_loop().run_in_executor(
+            None,
+            self._file.read,
+            self._chunk_size)
+        if not chunk:
+            raise StopAsyncIteration
+        return chunk
+
+
+class Upload:
+    '''File content sent in a multipart request.
+
+    The content is streamed in chunks, so only a chunk of it is in memory at
+    a time.
+
+    Args:
+        content: A local path, bytes, a binary file object or an async
+            iterable of bytes. File objects are read from their current
+            position, and are not closed. Files opened from a path are
+            closed after the request.
+        name(str): The filename sent to the server. Defaults to the name
+            of the file.
+        content_type(str): Defaults to a guess from the filename.
+        chunk_size(int): Bytes read at a time from file objects.
+    '''
+
+    def __init__(self, content, name=None, content_type=None,
+                 chunk_size=256 * 1024):
+        if name is None:
+            name = getattr(content, 'name', content)
+            name = os.path.basename(name) if isinstance(name, str) else 'file'
+        if content_type is None:
+            content_type = (mimetypes.guess_type(name)[0] or
+                            'application/octet-stream')
+
+        self.content = content
+        self.name = name
+        self.content_type = content_type
+        self._chunk_size = chunk_size
+        self._opened = None
+        self._start = None
+        if hasattr(content, 'read') and _seekable(content):
+            self._start = content.tell()
+
+    @property
+    def replayable(self):
+        '''Whether the content can be sent again, when a request is
+        retried.'''
+        if isinstance(self.content, (str, bytes, bytearray)):
+            return True
+        return self._start is not None
+
+    def open(self):
+        '''Return the content to send for one attempt of the request.'''
+        if isinstance(self.content, str):
+            self.close()
+            self._opened = open(self.content, 'rb')
+            return _FileChunks(self._opened, self._chunk_size)
+
+        if hasattr(self.content, 'read'):
+            if self._start is not None:
+                self.content.seek(self._start)
+            return _FileChunks(self.content, self._chunk_size)
+
+        return self.content
+
+    def close(self):
+        if self._opened is not None:
+            self._opened.close()
+            self._opened = None
+
+
+def _seekable(file):
+    seekable = getattr(file, 'seekable', None)
+    return seekable is not None and seekable()
@@ -0,0 +1,29 @@
+import collections
+
+
+class Watermark(collections.namedtuple('Watermark', ['id', 'created'])):
+    '''The newest message seen in a room, see Messages.sync.
+
+    Attributes:
+        id(str): The id of the message.
+        created(str): When the message was created, in ISO8601 format.
+    '''
+
+
+class MemoryWatermarkStore:
+    '''Keeps the watermarks of Messages.sync in memory.
+
+    Other stores, like one in a database, need the same two coroutine
+    methods, get and set.
+    '''
+
+    def __init__(self):
+        self._watermarks = {}
+
+    async def get(self, room_id):
+        '''Get the Watermark of a room, or None if it has none.'''
+        return self._watermarks.get(room_id)
+
+    async def set(self, room_id, watermark):
+        '''Set the Watermark of a room.'''
+        self._watermarks[room_id] = watermark
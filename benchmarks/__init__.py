@@ -0,0 +1,30 @@
+'''Benchmarks of aiosparkapi, run as modules, like
+python -m benchmarks.bench_json.
+'''
+
+ROOM_ID = ('Y2lzY29zcGFyazovL3VzL1JPT00vYmJjZWIxYWQtNDNmMS0zYjU4LTkxNDct'
+           'ZjE0YmIwYzRkMTU0')
+MENTIONED_PERSON_ID = ('Y2lzY29zcGFyazovL3VzL1BFT1BMRS8yNDlmNzRkOS1kYjhhLTQz'
+                       'Y2UtYWE4Ny1iNWM4ZDBjYjZiNmQ')
+
+
+def message(index, room_id=ROOM_ID):
+    '''A message the way the Spark api lists it, with an id unique to
+    index.'''
+    return {
+        'id': 'Y2lzY29zcGFyazovL3VzL01FU1NBR0UvOTJkYjNiZTAtNDNiZC0x'
+              'MWU2LThhZTktZGQ1YjNkZmM1NjVk{}'.format(index),
+        'roomId': room_id,
+        'roomType': 'group',
+        'text': 'PROJECT UPDATE - A new project plan has been published '
+                'on Box: http://box.com/s/lf5vj. The PM for this project '
+                'is Mike C. and the Engineering Manager is Jane W.',
+        'markdown': '**PROJECT UPDATE** A new project plan has been '
+                    'published [on Box](http://box.com/s/lf5vj).',
+        'files': ['http://www.example.com/images/media.png'],
+        'personId': 'Y2lzY29zcGFyazovL3VzL1BFT1BMRS9mNWIzNjE4Ny1jOGRkLTQ3'
+                    'MjctOGIyZi1mOWM0NDdmMjkwNDY',
+        'personEmail': 'matt@example.com',
+        'mentionedPeople': [MENTIONED_PERSON_ID],
+        'created': '2015-10-18T14:26:16+00:00',
+    }
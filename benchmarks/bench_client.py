@@ -0,0 +1,175 @@
+'''Measures the throughput and memory use of the client against a local
+FakeSparkServer, and compares them with earlier results.
+
+    python -m benchmarks.bench_client [--output FILE] [--compare FILE]
+
+With --output, the results are saved as JSON. Given the results of an
+earlier run with --compare, every measurement worse by more than
+--tolerance is reported, and the exit status is 1. The request and listing
+rates are the best of --repeat runs, to keep noise from failing the
+comparison. The response models are measured by benchmarks.bench_models.
+'''
+import argparse
+import asyncio
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+import aiohttp
+
+from aiosparkapi.api.messages import Message
+from aiosparkapi.requests import Requests
+from aiosparkapi.testing import FakeSparkServer
+from benchmarks import message
+
+
+# Whether a larger value of a measurement is better
+HIGHER_IS_BETTER = {
+    'get_per_second': True,
+    'create_per_second': True,
+    'pages_per_second': True,
+    'items_per_second': True,
+    'bytes_per_100k_items': False,
+}
+
+
+async def best_of(repeat, measure):
+    '''Run measure repeat times, keeping the highest value of every rate.'''
+    best = {}
+    for _ in range(repeat):
+        for name, value in (await measure()).items():
+            best[name] = max(value, best.get(name, value))
+    return best
+
+
+async def measure_requests(server, requests, count, concurrency, repeat):
+    room_id = server.populate(rooms=1, messages=count)[0]
+    # Different ids, so concurrent gets are not coalesced into one request
+    message_ids = [id for id, item in server.resources['messages'].items()
+                   if item['roomId'] == room_id]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(make_request):
+        async def limited(index):
+            async with semaphore:
+                await make_request(index)
+        start = time.perf_counter()
+        await asyncio.gather(*[limited(index) for index in range(count)])
+        return count / (time.perf_counter() - start)
+
+    async def measure():
+        return {
+            'get_per_second': await timed(
+                lambda index: requests.get('messages', message_ids[index])),
+            'create_per_second': await timed(
+                lambda index: requests.create(
+                    'messages', {'toRoomId': room_id, 'text': 'Hello'})),
+        }
+
+    return await best_of(repeat, measure)
+
+
+async def measure_listing(server, requests, items, page_size, repeat):
+    room_id = server.populate(rooms=1)[0]
+    messages = server.resources['messages']
+    for index in range(items):
+        item = message(index, room_id)
+        messages[item['id']] = item
+
+    async def measure():
+        listed_before = server.calls[('list', 'messages')]
+        start = time.perf_counter()
+        listed = 0
+        async for _ in await requests.list(
+                'messages', {'roomId': room_id, 'max': page_size}):
+            listed += 1
+        seconds = time.perf_counter() - start
+        pages = server.calls[('list', 'messages')] - listed_before
+        return {
+            'pages_per_second': pages / seconds,
+            'items_per_second': listed / seconds,
+        }
+
+    results = await best_of(repeat, measure)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = []
+    async for result in await requests.list(
+            'messages', {'roomId': room_id, 'max': page_size}):
+        kept.append(Message(result))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    results['bytes_per_100k_items'] = used * 100000 / len(kept)
+    return results
+
+
+async def run(arguments):
+    results = {}
+    async with FakeSparkServer(page_size=arguments.page_size) as server:
+        async with aiohttp.ClientSession() as session:
+            requests = Requests('token', session, baseurl=server.url)
+            results.update(await measure_requests(
+                server, requests, arguments.requests, arguments.concurrency,
+                arguments.repeat))
+            results.update(await measure_listing(
+                server, requests, arguments.items, arguments.page_size,
+                arguments.repeat))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, value in sorted(results.items()):
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        change = value / previous - 1
+        if not HIGHER_IS_BETTER[name]:
+            change = -change
+        print('{:<26}{:>14.2f}{:>14.2f}{:>+9.1%}'.format(
+            name, previous, value, change))
+        if change < -tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', metavar='FILE')
+    parser.add_argument('--compare', metavar='FILE')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    arguments = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    results = loop.run_until_complete(run(arguments))
+
+    if arguments.output is not None:
+        with open(arguments.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    if arguments.compare is None:
+        for name, value in sorted(results.items()):
+            print('{:<26}{:>14.2f}'.format(name, value))
+        return
+
+    with open(arguments.compare) as baseline_file:
+        baseline = json.load(baseline_file)
+    print('{:<26}{:>14}{:>14}{:>9}'.format('', 'baseline', 'now', 'change'))
+    regressions = compare(results, baseline, arguments.tolerance)
+    if regressions:
+        print('Regressed: {}'.format(', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+'''Compares JSON codecs decoding pages of messages.list.
+
+Pages are encoded the way the Spark api returns them, with the sizes used
+by the max parameter of listings.
+
+    python -m benchmarks.bench_json [--repeat N]
+'''
+import argparse
+import json
+import timeit
+
+from aiosparkapi.codec import JsonCodec, orjson
+from benchmarks import message
+
+
+PAGE_SIZES = [50, 100, 500, 1000]
+
+
+def page(size):
+    return json.dumps({'items': [message(i) for i in range(size)]}).encode()
+
+
+def codecs():
+    found = [('json', JsonCodec())]
+    if orjson is not None:
+        found.append(('orjson', JsonCodec(orjson.loads, orjson.dumps)))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    arguments = parser.parse_args()
+
+    available = codecs()
+    print('{:<12}'.format('page size') + ''.join(
+        '{:>16}'.format(name) for name, _ in available))
+
+    for size in PAGE_SIZES:
+        body = page(size)
+        timings = []
+        for _, codec in available:
+            seconds = min(timeit.repeat(
+                lambda: codec.loads(body),
+                number=arguments.repeat,
+                repeat=5))
+            timings.append(seconds / arguments.repeat * 1e6)
+        print('{:<12}'.format(size) + ''.join(
+            '{:>13.0f} us'.format(timing) for timing in timings))
+
+    if orjson is None:
+        print('orjson is not installed, only the json module was measured')
+
+
+if __name__ == '__main__':
+    main()
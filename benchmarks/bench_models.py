@@ -0,0 +1,132 @@
+'''Compares the response models with the dict wrapping models they replaced.
+
+Measures the memory used by every model object, on top of the decoded
+response it wraps, and the time to construct models and access their
+attributes.
+
+    python -m benchmarks.bench_models [--count N]
+'''
+import argparse
+import timeit
+import tracemalloc
+
+from aiosparkapi.api.messages import Message
+from aiosparkapi.api.rooms import Room
+from benchmarks import message
+
+
+class LegacyBaseResponse:
+
+    def __init__(self, result):
+        self._result = result
+
+    def __getattr__(self, item):
+        if item in self._result.keys():
+            return self._result[item]
+        error = "'{}' object has no attribute '{}'".format(
+                self.__class__.__name__, item)
+        raise AttributeError(error)
+
+
+class LegacyMessage(LegacyBaseResponse):
+
+    def __init__(self, result):
+        super(LegacyMessage, self).__init__(result)
+
+    @property
+    def id(self):
+        return self._result['id']
+
+    @property
+    def personEmail(self):
+        return self._result['personEmail']
+
+    @property
+    def text(self):
+        return self._result.get('text')
+
+
+class LegacyRoom(LegacyBaseResponse):
+
+    def __init__(self, result):
+        super(LegacyRoom, self).__init__(result)
+
+
+def room(index):
+    return {
+        'id': 'room_{}'.format(index),
+        'title': 'Room number {}'.format(index),
+        'type': 'group',
+        'isLocked': False,
+        'lastActivity': '2017-09-07T19:54:44.780Z',
+        'creatorId': 'some_person_id',
+        'created': '2017-09-07T19:54:44.780Z',
+    }
+
+
+def memory_per_object(Model, results):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    models = [Model(result) for result in results]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # The list holding the models is not part of their cost.
+    list_size = models.__sizeof__()
+    return (after - before - list_size) / len(models)
+
+
+def time_per_call(statement, number):
+    seconds = min(timeit.repeat(statement, number=number, repeat=5))
+    return seconds / number * 1e9
+
+
+def benchmark(name, Model, LegacyModel, results, attributes, count):
+    print(name)
+    print('  {:<28}{:>12}{:>12}'.format('', 'legacy', 'slots'))
+
+    memory = [memory_per_object(Model, results) for Model in
+              [LegacyModel, Model]]
+    print('  {:<28}{:>10.0f} B{:>10.0f} B'.format(
+        'memory per object', *memory))
+
+    result = results[0]
+    construction = [time_per_call(lambda: Model(result), count) for Model in
+                    [LegacyModel, Model]]
+    print('  {:<28}{:>9.0f} ns{:>9.0f} ns'.format(
+        'construction', *construction))
+
+    for attribute in attributes:
+        timings = []
+        for Model in [LegacyModel, Model]:
+            model = Model(result)
+            timings.append(time_per_call(
+                lambda: getattr(model, attribute),
+                count))
+        print('  {:<28}{:>9.0f} ns{:>9.0f} ns'.format(
+            'access {}'.format(attribute), *timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    arguments = parser.parse_args()
+
+    benchmark(
+        'Message',
+        Message,
+        LegacyMessage,
+        [message(index) for index in range(arguments.count)],
+        ['id', 'text', 'personEmail'],
+        arguments.count)
+    benchmark(
+        'Room',
+        Room,
+        LegacyRoom,
+        [room(index) for index in range(arguments.count)],
+        ['id', 'title'],
+        arguments.count)
+
+
+if __name__ == '__main__':
+    main()
@@ -34,5 +34,5 @@ setup(
     keywords='cisco spark api async enterprise messaging',
 
     packages=['aiosparkapi', 'aiosparkapi/api'],
-    install_requires=['aiohttp>=2.2.5'],
+    install_requires=['aiohttp>=3.3'],
 )
@@ -2,10 +2,11 @@ import os
 
 from invoke import Collection
 
-from . import test
+from . import bench, test
 
 while not os.path.isdir('tasks'):
     os.chdir('..')
 
 ns = Collection()
 ns.add_collection(Collection.from_module(test))
+ns.add_collection(Collection.from_module(bench))
@@ -0,0 +1,11 @@
+from invoke import task
+
+
+@task(default=True)
+def client(ctx, output=None, compare=None):
+    command = 'python -m benchmarks.bench_client'
+    if output:
+        command += ' --output {}'.format(output)
+    if compare:
+        command += ' --compare {}'.format(compare)
+    ctx.run(command, pty=True)
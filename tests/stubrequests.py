@@ -11,6 +11,9 @@ class IterableFaker:
         self._index += 1
         return answer
 
+    async def aclose(self):
+        self._index = self._len
+
 
 class StubRequests:
 
@@ -23,34 +26,54 @@ class StubRequests:
         self.get_id = None
         self.delete_id = None
         self.update_id = None
+        self.checkpoint = None
         self.results = []
 
-    async def list(self, path, parameters=None):
+    async def list(self, path, parameters=None, *, priority=None,
+                   read_ahead=None):
         self.path = path
         self.list_parameters = parameters
         return IterableFaker(self.results)
 
-    async def create(self, path, parameters, *, multipart=False):
+    async def resume(self, checkpoint, *, priority=None, read_ahead=None):
+        self.path = checkpoint.resource
+        self.checkpoint = checkpoint
+        return IterableFaker(self.results)
+
+    async def create(self, path, parameters, *, multipart=False,
+                     priority=None):
         self.path = path
         if not multipart:
             self.create_parameters = parameters
         else:
-            content = parameters['file']['content'].read()
-            parameters['file']['content'] = content
+            upload = parameters['file']
+            content = upload.open()
+            if not isinstance(content, bytes):
+                chunks = []
+                async for chunk in content:
+                    chunks.append(chunk)
+                content = b''.join(chunks)
+            upload.close()
+            parameters['file'] = {
+                'name': upload.name,
+                'content_type': upload.content_type,
+                'content': content,
+            }
             self.create_multipart_parameters = parameters
         return self.results
 
-    async def get(self, path, get_id):
+    async def get(self, path, get_id, *, priority=None):
         self.path = path
         self.get_id = get_id
         return self.results
 
-    async def delete(self, path, delete_id):
+    async def delete(self, path, delete_id, *, priority=None):
         self.path = path
         self.delete_id = delete_id
         return self.results
 
-    async def update(self, path, update_id, parameters):
+    async def update(self, path, update_id, parameters, *,
+                     priority=None):
         self.path = path
         self.update_id = update_id
         self.update_parameters = parameters
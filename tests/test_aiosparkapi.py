@@ -0,0 +1,62 @@
+from unittest import mock
+
+import aiohttp
+
+from aiosparkapi import AioSparkApi
+
+
+async def test_setup_configures_connection_pool():
+    api = AioSparkApi(
+        access_token='my_bot_token',
+        connection_limit=20,
+        connection_limit_per_host=10,
+        dns_cache_ttl=600,
+        keepalive_timeout=90)
+    with mock.patch(
+            'aiosparkapi.aiohttp.TCPConnector',
+            wraps=aiohttp.TCPConnector) as connector:
+        await api.setup()
+
+    connector.assert_called_once_with(
+        limit=20,
+        limit_per_host=10,
+        ttl_dns_cache=600,
+        keepalive_timeout=90)
+    assert api._client.connector.limit == 20
+
+    await api.close()
+    assert api._client.closed
+
+
+async def test_setup_uses_session_timeout():
+    timeout = aiohttp.ClientTimeout(total=30, connect=5)
+    api = AioSparkApi(access_token='my_bot_token', timeout=timeout)
+    await api.setup()
+
+    assert api._client.timeout == timeout
+
+    await api.close()
+
+
+async def test_supplied_session_is_used_and_not_closed():
+    session = aiohttp.ClientSession()
+    api = AioSparkApi(access_token='my_bot_token', session=session)
+    await api.setup()
+
+    assert api._client is session
+
+    async with api:
+        pass
+    assert not session.closed
+
+    await session.close()
+
+
+async def test_setup_creates_resources():
+    api = AioSparkApi(access_token='my_bot_token')
+    await api.setup()
+
+    assert api.teams._requests is api._requests
+    assert api.team_memberships._requests is api._requests
+
+    await api.close()
@@ -0,0 +1,50 @@
+import pytest
+
+from aiosparkapi.baseresponse import BaseResponse, field, optional_field
+
+
+class Resource(BaseResponse):
+
+    __slots__ = ()
+
+    id = field('id')
+    title = optional_field('title')
+
+
+def test_known_fields():
+    resource = Resource({'id': 'some id', 'title': 'Some title'})
+
+    assert resource.id == 'some id'
+    assert resource.title == 'Some title'
+
+
+def test_missing_optional_field_is_none():
+    assert Resource({'id': 'some id'}).title is None
+
+
+def test_missing_field_raises_attribute_error():
+    resource = Resource({'title': 'Some title'})
+
+    with pytest.raises(AttributeError):
+        resource.id
+    assert not hasattr(resource, 'id')
+
+
+def test_unknown_fields_are_attributes():
+    resource = Resource({'id': 'some id', 'extra': 'some extra'})
+
+    assert resource.extra == 'some extra'
+    with pytest.raises(AttributeError):
+        resource.missing
+
+
+def test_responses_have_no_instance_dictionary():
+    resource = Resource({'id': 'some id'})
+
+    assert not hasattr(resource, '__dict__')
+    with pytest.raises(AttributeError):
+        resource.other = 'value'
+
+
+def test_string_representation():
+    assert str(Resource({'id': 'some id'})) == '{\n  "id": "some id"\n}'
@@ -0,0 +1,78 @@
+from unittest import mock
+
+from aiosparkapi.cache import ResponseCache
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_only_configured_resources_are_cached():
+    cache = ResponseCache({'people': 60})
+
+    cache.set('people', 'some_id', {'id': 'some_id'})
+    cache.set('messages', 'some_id', {'id': 'some_id'})
+
+    assert cache.caches('people')
+    assert not cache.caches('messages')
+    assert len(cache) == 1
+
+
+def test_hits_and_misses_are_counted():
+    cache = ResponseCache({'people': 60})
+    cache.set('people', 'some_id', {'id': 'some_id'})
+
+    assert cache.get('people', 'some_id') == {'id': 'some_id'}
+    assert cache.get('people', 'other_id') is None
+    assert cache.get('rooms', 'some_id') is None
+
+    assert cache.hits == 1
+    assert cache.misses == 2
+
+
+def test_entries_expire_by_resource():
+    clock = Clock()
+    with mock.patch('aiosparkapi.cache.time.monotonic', clock):
+        cache = ResponseCache({'people': 60, 'rooms': 10})
+        cache.set('people', 'some_id', 'person')
+        cache.set('rooms', 'some_id', 'room')
+
+        clock.now += 30
+        assert cache.get('people', 'some_id') == 'person'
+        assert cache.get('rooms', 'some_id') is None
+        assert len(cache) == 1
+
+
+def test_least_recently_used_entries_are_dropped():
+    cache = ResponseCache({'people': 60}, maxsize=2)
+    cache.set('people', 'first', 1)
+    cache.set('people', 'second', 2)
+    cache.get('people', 'first')
+    cache.set('people', 'third', 3)
+
+    assert cache.get('people', 'first') == 1
+    assert cache.get('people', 'second') is None
+    assert cache.get('people', 'third') == 3
+
+
+def test_invalidate():
+    cache = ResponseCache({'people': 60, 'rooms': 60})
+    cache.set('people', 'first', 1)
+    cache.set('people', 'second', 2)
+    cache.set('rooms', 'first', 3)
+
+    cache.invalidate('people', 'first')
+    assert cache.get('people', 'first') is None
+    assert cache.get('people', 'second') == 2
+
+    cache.invalidate('people')
+    assert cache.get('people', 'second') is None
+    assert cache.get('rooms', 'first') == 3
+
+    cache.clear()
+    assert len(cache) == 0
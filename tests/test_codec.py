@@ -0,0 +1,29 @@
+import json
+from unittest import mock
+
+import aiosparkapi.codec as codec
+
+
+def test_stdlib_codec_decodes_bytes():
+    json_codec = codec.JsonCodec()
+
+    assert json_codec.loads(b'{"id": "\xc3\xa6"}') == {'id': '\xe6'}
+    assert json_codec.loads('{"id": 1}') == {'id': 1}
+    assert json.loads(json_codec.dumps({'id': 1})) == {'id': 1}
+
+
+def test_default_codec_uses_orjson_when_installed():
+    orjson = mock.Mock()
+    with mock.patch.object(codec, 'orjson', orjson):
+        json_codec = codec.default_codec()
+
+    assert json_codec.loads is orjson.loads
+    assert json_codec.dumps is orjson.dumps
+
+
+def test_default_codec_without_orjson():
+    with mock.patch.object(codec, 'orjson', None):
+        json_codec = codec.default_codec()
+
+    assert json_codec.loads(b'{"id": 1}') == {'id': 1}
+    assert json_codec.dumps({'id': 1}) == '{"id": 1}'
@@ -0,0 +1,179 @@
+import asyncio
+
+import pytest
+
+import aiosparkapi.api.memberships
+from aiosparkapi.exceptions import SparkApiException
+from aiosparkapi.scheduler import Priority
+from .stubrequests import IterableFaker, StubRequests
+
+
+async def test_creating_membership_by_email():
+    requests = StubRequests()
+    requests.results = {'id': 'some id', 'roomId': 'some room id'}
+    memberships = aiosparkapi.api.memberships.Memberships(requests)
+
+    response = await memberships.create(
+        roomId='some room id',
+        personEmail='person@example.com')
+
+    assert requests.path == 'memberships'
+    assert requests.create_parameters == {
+        'roomId': 'some room id',
+        'personEmail': 'person@example.com',
+        'isModerator': False,
+    }
+    assert isinstance(response, aiosparkapi.api.memberships.Membership)
+
+
+async def test_creating_moderator_membership_by_id():
+    requests = StubRequests()
+    memberships = aiosparkapi.api.memberships.Memberships(requests)
+
+    await memberships.create(
+        roomId='some room id',
+        personId='some person id',
+        isModerator=True)
+
+    assert requests.create_parameters == {
+        'roomId': 'some room id',
+        'personId': 'some person id',
+        'isModerator': True,
+    }
+
+
+async def test_creating_membership_requires_room_and_one_person():
+    requests = StubRequests()
+    memberships = aiosparkapi.api.memberships.Memberships(requests)
+
+    with pytest.raises(AssertionError):
+        await memberships.create(personId='some person id')
+
+    with pytest.raises(AssertionError):
+        await memberships.create(roomId='some room id')
+
+    with pytest.raises(AssertionError):
+        await memberships.create(
+            roomId='some room id',
+            personId='some person id',
+            personEmail='person@example.com')
+
+
+async def test_updating_membership():
+    requests = StubRequests()
+    requests.results = {'id': 'some id', 'isModerator': True}
+    memberships = aiosparkapi.api.memberships.Memberships(requests)
+
+    response = await memberships.update('some id', isModerator=True)
+
+    assert requests.path == 'memberships'
+    assert requests.update_id == 'some id'
+    assert requests.update_parameters == {'isModerator': True}
+    assert isinstance(response, aiosparkapi.api.memberships.Membership)
+
+
+async def test_updating_membership_without_moderator_flag():
+    requests = StubRequests()
+    memberships = aiosparkapi.api.memberships.Memberships(requests)
+
+    with pytest.raises(AssertionError):
+        await memberships.update('some id')
+
+
+async def test_deleting_membership():
+    requests = StubRequests()
+    memberships = aiosparkapi.api.memberships.Memberships(requests)
+
+    await memberships.delete('some id')
+
+    assert requests.path == 'memberships'
+    assert requests.delete_id == 'some id'
+
+
+class MembershipServer:
+
+    def __init__(self, *emails):
+        self.members = [
+            {'id': email, 'roomId': 'room', 'personEmail': email}
+            for email in emails]
+        self.lists = []
+        self.created = []
+        self.priorities = []
+        self.running = 0
+        self.most_running = 0
+
+    async def list(self, path, parameters=None, **kwargs):
+        self.lists.append(parameters)
+        return IterableFaker(list(self.members))
+
+    async def create(self, path, parameters, *, priority=None, **kwargs):
+        self.running += 1
+        self.most_running = max(self.most_running, self.running)
+        try:
+            await asyncio.sleep(0.001)
+            email = parameters['personEmail']
+            self.created.append(email)
+            self.priorities.append(priority)
+            if email.startswith('unknown'):
+                raise SparkApiException(404, {}, 'Not found')
+            return dict(parameters, id=email)
+        finally:
+            self.running -= 1
+
+
+async def test_adding_members():
+    server = MembershipServer('member@example.com')
+    memberships = aiosparkapi.api.memberships.Memberships(server)
+
+    results = await memberships.add_members('room', [
+        'new@example.com',
+        'Member@example.com',
+        'unknown@example.com',
+        'other@example.com',
+    ])
+
+    assert server.lists == [{'roomId': 'room'}]
+    assert sorted(server.created) == [
+        'new@example.com', 'other@example.com', 'unknown@example.com']
+    assert set(server.priorities) == {Priority.BULK}
+    assert [result.email for result in results] == [
+        'new@example.com',
+        'Member@example.com',
+        'unknown@example.com',
+        'other@example.com',
+    ]
+    assert [result.ok for result in results] == [True, True, False, True]
+    assert [result.existing for result in results] == [
+        False, True, False, False]
+    assert results[0].membership.id == 'new@example.com'
+    assert results[1].membership.id == 'member@example.com'
+    assert isinstance(results[2].error, SparkApiException)
+    assert results[2].membership is None
+
+
+async def test_adding_same_member_twice_creates_one_membership():
+    server = MembershipServer()
+    memberships = aiosparkapi.api.memberships.Memberships(server)
+
+    results = await memberships.add_members(
+        'room', ['new@example.com', 'NEW@example.com'])
+
+    assert server.created == ['new@example.com']
+    assert [result.email for result in results] == [
+        'new@example.com', 'NEW@example.com']
+    assert all(result.ok for result in results)
+
+
+async def test_adding_members_is_limited_by_concurrency():
+    server = MembershipServer()
+    memberships = aiosparkapi.api.memberships.Memberships(server)
+
+    results = await memberships.add_members(
+        'room',
+        ['{}@example.com'.format(i) for i in range(10)],
+        isModerator=True,
+        concurrency=3)
+
+    assert len(server.created) == 10
+    assert server.most_running == 3
+    assert all(result.ok for result in results)
@@ -1,8 +1,20 @@
+import asyncio
+import io
+
 import pytest
 from unittest import mock
 
+import aiosparkapi.api.memberships
 import aiosparkapi.api.messages
-from .stubrequests import StubRequests
+import aiosparkapi.api.rooms
+import aiosparkapi.async_generator
+import aiosparkapi.exceptions as exceptions
+from aiosparkapi import AioSparkApi
+from aiosparkapi.requests import Checkpoint, FileInfo
+from aiosparkapi.scheduler import Priority
+from aiosparkapi.testing import FakeSparkServer
+from aiosparkapi.watermarks import MemoryWatermarkStore, Watermark
+from .stubrequests import IterableFaker, StubRequests
 
 
 async def test_list_with_all_required_parameters():
@@ -195,7 +207,7 @@ async def test_creating_message_with_local_file():
     messages = aiosparkapi.api.messages.Messages(requests)
 
     with mock.patch(
-            'aiosparkapi.api.messages.open',
+            'aiosparkapi.upload.open',
             mock.mock_open(read_data=b'Some data')) as m:
         await messages.create(
             toPersonEmail='foo@cisco.com',
@@ -207,6 +219,7 @@ async def test_creating_message_with_local_file():
         'toPersonEmail': 'foo@cisco.com',
         'file': {
             'name': 'some_local_file.png',
+            'content_type': 'image/png',
             'content': b'Some data',
         }
     }
@@ -215,6 +228,40 @@ async def test_creating_message_with_local_file():
     assert requests.create_multipart_parameters == expected
 
 
+async def test_creating_message_with_bytes():
+    requests = StubRequests()
+    messages = aiosparkapi.api.messages.Messages(requests)
+
+    await messages.create(
+        toPersonEmail='foo@cisco.com',
+        files=[b'Some data'],
+        filename='report.pdf')
+
+    assert requests.create_multipart_parameters['file'] == {
+        'name': 'report.pdf',
+        'content_type': 'application/pdf',
+        'content': b'Some data',
+    }
+
+
+async def test_creating_message_with_file_object():
+    requests = StubRequests()
+    messages = aiosparkapi.api.messages.Messages(requests)
+    content = io.BytesIO(b'Some data')
+
+    await messages.create(
+        toPersonEmail='foo@cisco.com',
+        files=[content],
+        content_type='text/plain')
+
+    assert requests.create_multipart_parameters['file'] == {
+        'name': 'file',
+        'content_type': 'text/plain',
+        'content': b'Some data',
+    }
+    assert not content.closed
+
+
 async def test_creating_messages_without_recipient():
     requests = StubRequests()
     messages = aiosparkapi.api.messages.Messages(requests)
@@ -298,3 +345,412 @@ async def test_delete_message():
     assert requests.path == 'messages'
     assert requests.delete_id == 'message_id'
     assert not response
+
+
+class FailingRequests(StubRequests):
+
+    def __init__(self, failures):
+        super(FailingRequests, self).__init__()
+        self.failures = failures
+        self.created = []
+        self.priorities = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.saved = []
+
+    async def create(self, path, parameters, *, multipart=False,
+                     priority=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0)
+        self.in_flight -= 1
+
+        self.priorities.append(priority)
+        recipient = parameters['toPersonEmail']
+        if recipient in self.failures:
+            raise self.failures[recipient]
+        self.created.append(recipient)
+        return {'id': recipient, 'toPersonEmail': recipient}
+
+
+async def test_create_many_returns_result_per_message():
+    requests = FailingRequests({
+        'busy@cisco.com': exceptions.TooManyRequests(10),
+        'broken@cisco.com': exceptions.ServerError(500, {}),
+    })
+    messages = aiosparkapi.api.messages.Messages(requests)
+    arguments = [
+        {'toPersonEmail': 'first@cisco.com', 'text': 'Hello'},
+        {'toPersonEmail': 'busy@cisco.com', 'text': 'Hello'},
+        {'toPersonEmail': 'second@cisco.com', 'text': 'Hello'},
+        {'toPersonEmail': 'broken@cisco.com', 'text': 'Hello'},
+        {'text': 'No recipient'},
+        {'toPersonEmail': 'third@cisco.com', 'text': 'Hello'},
+    ]
+
+    results = await messages.create_many(arguments, concurrency=2)
+
+    assert [result.arguments for result in results] == arguments
+    assert [result.ok for result in results] == [
+        True, False, True, False, False, True]
+    assert results[0].message.id == 'first@cisco.com'
+    assert isinstance(results[0].message, aiosparkapi.api.messages.Message)
+    assert isinstance(results[1].error, exceptions.TooManyRequests)
+    assert isinstance(results[3].error, exceptions.ServerError)
+    assert isinstance(results[4].error, AssertionError)
+    assert results[1].message is None
+    assert sorted(requests.created) == [
+        'first@cisco.com', 'second@cisco.com', 'third@cisco.com']
+
+
+async def test_create_many_limits_concurrency():
+    requests = FailingRequests({})
+    messages = aiosparkapi.api.messages.Messages(requests)
+    arguments = (
+        {'toPersonEmail': '{}@cisco.com'.format(i), 'text': 'Hello'}
+        for i in range(50))
+
+    results = await messages.create_many(arguments, concurrency=3)
+
+    assert len(results) == 50
+    assert requests.max_in_flight == 3
+    assert set(requests.priorities) == {Priority.BULK}
+
+
+async def test_create_many_without_messages():
+    messages = aiosparkapi.api.messages.Messages(StubRequests())
+
+    assert await messages.create_many([]) == []
+
+
+class DownloadingRequests(StubRequests):
+
+    def __init__(self):
+        super(DownloadingRequests, self).__init__()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.saved = []
+
+    def download(self, url, *, chunk_size):
+        requests = self
+
+        class Download:
+            info = FileInfo(url.split('/')[-1], None, 'text/plain')
+
+            async def __aenter__(self):
+                requests.in_flight += 1
+                requests.max_in_flight = max(
+                    requests.max_in_flight,
+                    requests.in_flight)
+                return self
+
+            async def __aexit__(self, exc_type, exc, tb):
+                requests.in_flight -= 1
+
+            async def save(self, path):
+                await asyncio.sleep(0)
+                requests.saved.append(path)
+                return path
+
+        return Download()
+
+
+async def test_download_files_to_directory(tmpdir):
+    requests = DownloadingRequests()
+    messages = aiosparkapi.api.messages.Messages(requests)
+    files = ['https://some_file_hoster.com/{}'.format(i) for i in range(10)]
+
+    paths = await messages.download_files(files, str(tmpdir), concurrency=3)
+
+    assert paths == [str(tmpdir.join(str(i))) for i in range(10)]
+    assert requests.max_in_flight == 3
+
+
+async def test_download_files_with_same_name_are_not_overwritten(tmpdir):
+    requests = DownloadingRequests()
+    messages = aiosparkapi.api.messages.Messages(requests)
+    tmpdir.join('notes').write('existing')
+    files = [
+        'https://some_file_hoster.com/1/report.txt',
+        'https://some_file_hoster.com/2/report.txt',
+        'https://some_file_hoster.com/3/notes',
+        'https://some_file_hoster.com/',
+    ]
+
+    paths = await messages.download_files(files, str(tmpdir))
+
+    assert paths == [
+        str(tmpdir.join('report.txt')),
+        str(tmpdir.join('report-1.txt')),
+        str(tmpdir.join('notes-1')),
+        str(tmpdir.join('file')),
+    ]
+    assert tmpdir.join('notes').read() == 'existing'
+
+
+async def test_resuming_messages():
+    requests = StubRequests()
+    requests.results = [{'id': 'some message id'}]
+    messages = aiosparkapi.api.messages.Messages(requests)
+    checkpoint = Checkpoint('messages', 'https://next/page', 3)
+
+    result = await messages.resume(checkpoint)
+
+    assert requests.checkpoint == checkpoint
+    got = await result.__anext__()
+    assert isinstance(got, aiosparkapi.api.messages.Message)
+
+    with pytest.raises(AssertionError):
+        await messages.resume(Checkpoint('people', 'https://next/page', 3))
+
+
+async def collect(iterator):
+    items = []
+    async for item in iterator:
+        items.append(item)
+    return items
+
+
+class SlowIterable(IterableFaker):
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0.001)
+        return await super(SlowIterable, self).__anext__()
+
+
+class RoomsServer:
+
+    def __init__(self, rooms):
+        self.rooms = rooms
+        self.listed = []
+        self.priorities = set()
+        self.running = 0
+        self.most_running = 0
+
+    async def list(self, path, parameters=None, *, priority=None, **kwargs):
+        assert path == 'messages'
+        self.listed.append(parameters)
+        self.priorities.add(priority)
+        room_id = parameters['roomId']
+        if room_id not in self.rooms:
+            raise exceptions.SparkApiException(404, {}, 'Not found')
+        server = self
+
+        class Listing(SlowIterable):
+            async def aclose(self):
+                server.running -= 1
+
+        self.running += 1
+        self.most_running = max(self.most_running, self.running)
+        return Listing([{'id': id, 'roomId': room_id}
+                        for id in self.rooms[room_id]])
+
+
+async def test_exporting_messages_from_rooms():
+    server = RoomsServer({
+        'first': ['1', '2', '3'],
+        'second': [],
+        'third': ['4', '5'],
+    })
+    messages = aiosparkapi.api.messages.Messages(server)
+    progress = []
+    rooms = [
+        'first',
+        aiosparkapi.api.memberships.Membership({'roomId': 'second'}),
+        aiosparkapi.api.rooms.Room({'id': 'third'}),
+    ]
+
+    export = messages.export(
+        rooms, concurrency=2, max=50, progress=progress.append)
+    exported = []
+    async for room_id, message in export:
+        assert isinstance(message, aiosparkapi.api.messages.Message)
+        exported.append((room_id, message.id))
+
+    assert sorted(exported) == [
+        ('first', '1'), ('first', '2'), ('first', '3'),
+        ('third', '4'), ('third', '5')]
+    assert sorted(p['roomId'] for p in server.listed) == [
+        'first', 'second', 'third']
+    assert all(p['max'] == 50 for p in server.listed)
+    assert server.priorities == {Priority.BULK}
+    assert server.most_running == 2
+    assert progress[-1] == (3, 3, 5, 0)
+    assert [p.rooms_done for p in progress] == [1, 2, 3]
+    assert export.progress() == progress[-1]
+
+
+async def test_exporting_from_async_rooms_continues_after_errors():
+    server = RoomsServer({'first': ['1'], 'third': ['2']})
+    messages = aiosparkapi.api.messages.Messages(server)
+
+    rooms = aiosparkapi.async_generator.AsyncGenerator(
+        SlowIterable([{'id': 'first'}, {'id': 'missing'}, {'id': 'third'}]),
+        aiosparkapi.api.rooms.Room)
+    export = messages.export(rooms, concurrency=3)
+    exported = []
+    async for room_id, message in export:
+        exported.append(message.id)
+
+    assert sorted(exported) == ['1', '2']
+    room_id, error = export.errors[0]
+    assert room_id == 'missing'
+    assert isinstance(error, exceptions.SparkApiException)
+    assert export.progress().errors == 1
+    with pytest.raises(StopAsyncIteration):
+        await export.__anext__()
+
+
+async def test_exporting_continues_when_progress_fails():
+    server = RoomsServer({'first': ['1'], 'second': ['2']})
+    messages = aiosparkapi.api.messages.Messages(server)
+
+    def progress(done):
+        raise RuntimeError('Progress failed')
+
+    export = messages.export(['first', 'second'], progress=progress)
+    exported = await asyncio.wait_for(collect(export), 1)
+
+    assert sorted(item.message.id for item in exported) == ['1', '2']
+    assert sorted(room_id for room_id, _ in export.errors) == [
+        'first', 'second']
+    assert all(isinstance(error, RuntimeError) for _, error in export.errors)
+
+
+async def test_exporting_is_limited_by_queue_and_can_be_closed():
+    server = RoomsServer({'first': [str(i) for i in range(100)]})
+    messages = aiosparkapi.api.messages.Messages(server)
+
+    export = messages.export(['first'], queue_size=5)
+    first = await export.__anext__()
+    await asyncio.sleep(0.05)
+
+    assert first.message.id == '0'
+    assert export.messages <= 7
+    await export.aclose()
+
+
+class HistoryServer:
+
+    def __init__(self, **rooms):
+        self.rooms = rooms
+        self.listed = []
+        self.read = 0
+
+    def send(self, room_id, message_id):
+        created = '2017-09-07T19:54:{:02}.000Z'.format(int(message_id))
+        self.rooms.setdefault(room_id, []).insert(
+            0, {'id': message_id, 'roomId': room_id, 'created': created})
+
+    async def list(self, path, parameters=None, **kwargs):
+        self.listed.append(parameters)
+        server = self
+
+        class Listing(SlowIterable):
+            async def __anext__(self):
+                result = await super(Listing, self).__anext__()
+                server.read += 1
+                return result
+
+        return Listing(list(self.rooms.get(parameters['roomId'], [])))
+
+
+async def test_sync_gets_new_messages_since_watermark():
+    server = HistoryServer()
+    for message_id in ['1', '2', '3']:
+        server.send('room', message_id)
+    messages = aiosparkapi.api.messages.Messages(server)
+    store = MemoryWatermarkStore()
+
+    assert await messages.sync('room', store) == []
+    assert server.listed == [{'roomId': 'room', 'max': 1}]
+    assert await store.get('room') == Watermark(
+        '3', '2017-09-07T19:54:03.000Z')
+
+    server.send('room', '4')
+    server.send('room', '5')
+    server.read = 0
+    new = await messages.sync('room', store)
+
+    assert [message.id for message in new] == ['4', '5']
+    assert all(isinstance(message, aiosparkapi.api.messages.Message)
+               for message in new)
+    assert server.read == 3
+    assert (await store.get('room')).id == '5'
+
+    assert await messages.sync('room', store) == []
+    assert (await store.get('room')).id == '5'
+
+
+async def test_sync_with_backfill_gets_all_messages():
+    server = HistoryServer()
+    for message_id in ['1', '2', '3']:
+        server.send('room', message_id)
+    messages = aiosparkapi.api.messages.Messages(server)
+    store = MemoryWatermarkStore()
+
+    new = await messages.sync('room', store, backfill=True, max=2)
+
+    assert [message.id for message in new] == ['1', '2', '3']
+    assert server.listed == [{'roomId': 'room', 'max': 2}]
+    assert (await store.get('room')).id == '3'
+
+
+async def test_sync_stops_at_older_messages_if_watermark_is_deleted():
+    server = HistoryServer()
+    for message_id in ['1', '2', '3']:
+        server.send('room', message_id)
+    messages = aiosparkapi.api.messages.Messages(server)
+    store = MemoryWatermarkStore()
+    await store.set('room', Watermark('deleted', '2017-09-07T19:54:02.500Z'))
+
+    new = await messages.sync('room', store)
+
+    assert [message.id for message in new] == ['3']
+
+
+async def test_sync_does_not_read_past_watermark_with_read_ahead():
+    async with FakeSparkServer() as server:
+        room_id, = server.populate(messages=10)
+        async with AioSparkApi(access_token='my_bot_token',
+                               baseurl=server.url,
+                               read_ahead=3) as api:
+            await api.setup()
+            store = MemoryWatermarkStore()
+            await api.messages.sync(room_id, store, max=2)
+            for text in ['First', 'Second', 'Third']:
+                server.add('messages', roomId=room_id, text=text)
+            listed = server.calls[('list', 'messages')]
+
+            new = await api.messages.sync(room_id, store, max=2)
+            await asyncio.sleep(0.05)
+
+            assert [message.text for message in new] == [
+                'First', 'Second', 'Third']
+            assert server.calls[('list', 'messages')] == listed + 2
+
+            await api.messages.sync(room_id, store, max=2)
+            await asyncio.sleep(0.05)
+
+            assert server.calls[('list', 'messages')] == listed + 3
+
+
+async def test_sync_rooms():
+    server = HistoryServer()
+    server.send('first', '1')
+    server.send('second', '2')
+    messages = aiosparkapi.api.messages.Messages(server)
+    store = MemoryWatermarkStore()
+
+    new = await messages.sync_rooms(
+        ['first', 'second', 'empty'], store, backfill=True)
+
+    assert {room: [m.id for m in found] for room, found in new.items()} == {
+        'first': ['1'],
+        'second': ['2'],
+        'empty': [],
+    }
+    assert await store.get('empty') is None
@@ -0,0 +1,173 @@
+import gzip
+import json
+
+import pytest
+
+from aiosparkapi.api.messages import Messages
+from aiosparkapi.api.people import Person
+from aiosparkapi.ndjson import NdjsonExporter
+from aiosparkapi.requests import Checkpoint
+
+
+class Listing:
+    '''Lists items in pages of three, and fails after failing_after.'''
+
+    def __init__(self, items, page=0, offset=0, failing_after=None):
+        self._items = items
+        self._position = page * 3 + offset
+        self._failing_after = failing_after
+
+    @classmethod
+    def resume(cls, items, checkpoint):
+        if checkpoint.link is None:
+            return cls([])
+        return cls(items, int(checkpoint.link), checkpoint.offset)
+
+    def checkpoint(self):
+        if self._position >= len(self._items):
+            return Checkpoint('people', None, 0)
+        page, offset = divmod(self._position, 3)
+        return Checkpoint('people', str(page), offset)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._position == self._failing_after:
+            raise RuntimeError('Connection lost')
+        if self._position >= len(self._items):
+            raise StopAsyncIteration
+        item = self._items[self._position]
+        self._position += 1
+        return Person(item)
+
+
+class PlainListing:
+
+    def __init__(self, items):
+        self._items = iter(items)
+
+    async def aclose(self):
+        pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._items)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def people(count):
+    return [{'id': str(i), 'displayName': 'Person {}'.format(i)}
+            for i in range(count)]
+
+
+def read_lines(path, compressed=False):
+    opener = gzip.open if compressed else open
+    with opener(str(path), 'rb') as ndjson:
+        return [json.loads(line.decode()) for line in ndjson]
+
+
+async def test_export_writes_one_compact_document_per_line(tmpdir):
+    path = tmpdir.join('people.jsonl')
+    exporter = NdjsonExporter(str(path), batch_size=4)
+
+    count = await exporter.export(Listing(people(10)))
+
+    assert count == 10
+    assert read_lines(path) == people(10)
+    assert path.read_binary().startswith(b'{"id":"0","displayName"')
+    assert exporter.checkpoint() is None
+    assert not tmpdir.join('people.jsonl.checkpoint').exists()
+
+
+async def test_export_compresses(tmpdir):
+    path = tmpdir.join('people.jsonl.gz')
+    exporter = NdjsonExporter(str(path), compress=True, batch_size=3)
+
+    await exporter.export(Listing(people(7)))
+
+    assert read_lines(path, compressed=True) == people(7)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+async def test_interrupted_export_is_resumed(tmpdir, compress):
+    path = tmpdir.join('people.jsonl')
+    items = people(20)
+    exporter = NdjsonExporter(str(path), compress=compress, batch_size=4)
+
+    assert exporter.checkpoint() is None
+    with pytest.raises(RuntimeError):
+        await exporter.export(Listing(items, failing_after=14))
+
+    checkpoint = exporter.checkpoint()
+    assert checkpoint == Checkpoint('people', '4', 0)
+
+    exporter = NdjsonExporter(str(path), compress=compress, batch_size=4)
+    count = await exporter.export(
+        Listing.resume(items, checkpoint), resume=True)
+
+    assert count == 20
+    assert read_lines(path, compressed=compress) == items
+    assert exporter.checkpoint() is None
+
+
+async def test_export_without_resume_starts_over(tmpdir):
+    path = tmpdir.join('people.jsonl')
+    items = people(10)
+    exporter = NdjsonExporter(str(path), batch_size=4)
+
+    with pytest.raises(RuntimeError):
+        await exporter.export(Listing(items, failing_after=6))
+    assert exporter.checkpoint() is not None
+
+    count = await exporter.export(Listing(items))
+
+    assert count == 10
+    assert read_lines(path) == items
+
+    count = await exporter.export(Listing(items))
+
+    assert count == 10
+    assert read_lines(path) == items
+
+
+async def test_export_without_checkpoints_starts_over(tmpdir):
+    path = tmpdir.join('rooms.jsonl')
+    exporter = NdjsonExporter(str(path), batch_size=2)
+
+    await exporter.export(PlainListing([{'id': 'first'}]))
+    count = await exporter.export(PlainListing([{'id': 'a'}, {'id': 'b'}]))
+
+    assert count == 2
+    assert read_lines(path) == [{'id': 'a'}, {'id': 'b'}]
+    assert exporter.checkpoint() is None
+
+
+class MessagesRequests:
+
+    def __init__(self, **rooms):
+        self._rooms = rooms
+
+    async def list(self, path, parameters=None, **kwargs):
+        return PlainListing([
+            {'id': text, 'text': text}
+            for text in self._rooms[parameters['roomId']]])
+
+
+async def test_export_writes_message_export_with_rooms(tmpdir):
+    path = tmpdir.join('messages.jsonl')
+    exporter = NdjsonExporter(str(path))
+    messages = Messages(MessagesRequests(first=['Hello', 'Bye']))
+
+    count = await exporter.export(messages.export(['first']))
+
+    assert count == 2
+    assert read_lines(path) == [
+        {'id': 'Hello', 'text': 'Hello', 'roomId': 'first'},
+        {'id': 'Bye', 'text': 'Bye', 'roomId': 'first'},
+    ]
+    assert exporter.checkpoint() is None
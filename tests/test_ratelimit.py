@@ -0,0 +1,99 @@
+from unittest import mock
+
+import pytest
+
+from aiosparkapi.ratelimit import RateLimiter, TokenBucket
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_bursts_up_to_capacity():
+    clock = Clock()
+    with mock.patch('aiosparkapi.ratelimit.time.monotonic', clock):
+        bucket = TokenBucket(2, 3)
+
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0.5
+        assert bucket.reserve() == 1.0
+
+
+def test_bucket_refills_over_time():
+    clock = Clock()
+    with mock.patch('aiosparkapi.ratelimit.time.monotonic', clock):
+        bucket = TokenBucket(10, 1)
+
+        assert bucket.reserve() == 0
+        clock.now += 0.05
+        assert bucket.tokens == pytest.approx(0.5)
+        clock.now += 10
+        assert bucket.tokens == 1
+
+
+def test_bucket_capacity_defaults_to_rate():
+    bucket = TokenBucket(5)
+
+    assert bucket.capacity == 5
+
+
+async def test_limiter_waits_for_endpoint_bucket():
+    clock = Clock()
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+
+    with mock.patch('aiosparkapi.ratelimit.time.monotonic', clock), \
+            mock.patch('aiosparkapi.ratelimit.asyncio.sleep', sleep):
+        limiter = RateLimiter(
+            100,
+            endpoints={('POST', 'messages'): (1, 1)})
+
+        await limiter.acquire('POST', 'messages')
+        await limiter.acquire('GET', 'messages')
+        await limiter.acquire('POST', 'messages')
+
+    assert sleeps == [1.0]
+
+
+async def test_limiter_matches_resource_for_all_methods():
+    clock = Clock()
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+
+    with mock.patch('aiosparkapi.ratelimit.time.monotonic', clock), \
+            mock.patch('aiosparkapi.ratelimit.asyncio.sleep', sleep):
+        limiter = RateLimiter(100, endpoints={'people': (2, 1)})
+
+        await limiter.acquire('GET', 'people')
+        await limiter.acquire('GET', 'people')
+        await limiter.acquire('GET', 'rooms')
+
+    assert sleeps == [0.5]
+
+
+async def test_limiter_waits_for_token_bucket():
+    clock = Clock()
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+
+    with mock.patch('aiosparkapi.ratelimit.time.monotonic', clock), \
+            mock.patch('aiosparkapi.ratelimit.asyncio.sleep', sleep):
+        limiter = RateLimiter(4, 1)
+
+        await limiter.acquire('GET', 'people')
+        await limiter.acquire('GET', 'rooms')
+
+    assert sleeps == [0.25]
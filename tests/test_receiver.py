@@ -0,0 +1,292 @@
+import asyncio
+import json
+
+from aiosparkapi.api.messages import Message
+from aiosparkapi.api.memberships import Membership
+from aiosparkapi.api.webhooks import WebhookEvent
+from aiosparkapi.api.people import Person
+from aiosparkapi.exceptions import SparkApiException
+from aiosparkapi.receiver import MessageEnricher, WebhookReceiver, signature
+
+
+def event(resource='messages', event='created', data=None):
+    return {
+        'id': 'some webhook id',
+        'name': 'My webhook',
+        'targetUrl': 'https://example.com/webhooks',
+        'resource': resource,
+        'event': event,
+        'orgId': 'some org id',
+        'createdBy': 'some person id',
+        'appId': 'some app id',
+        'ownedBy': 'creator',
+        'status': 'active',
+        'actorId': 'some actor id',
+        'created': '2017-09-07T19:54:44.780Z',
+        'data': data or {
+            'id': 'some message id',
+            'roomId': 'some room id',
+            'personId': 'some person id',
+        },
+    }
+
+
+async def post(client, payload, sign_with=None):
+    body = json.dumps(payload).encode()
+    headers = {'content-type': 'application/json'}
+    if sign_with is not None:
+        headers['X-Spark-Signature'] = signature(sign_with, body)
+    return await client.post('/webhooks', data=body, headers=headers)
+
+
+async def create_client(test_client, receiver):
+    return await test_client(receiver.make_app('/webhooks'))
+
+
+async def test_events_are_dispatched_to_handlers(test_client):
+    receiver = WebhookReceiver()
+    messages = []
+    memberships = []
+    everything = []
+
+    async def on_message(event):
+        messages.append(event)
+
+    async def on_membership(event):
+        memberships.append(event)
+
+    async def on_anything(event):
+        everything.append(event)
+
+    receiver.on('messages', 'created', on_message)
+    receiver.on('memberships', None, on_membership)
+    receiver.on(None, None, on_anything)
+    client = await create_client(test_client, receiver)
+
+    response = await post(client, event())
+    assert response.status == 204
+    await post(client, event('memberships', 'deleted', {'id': 'some id'}))
+    await post(client, event('messages', 'deleted'))
+    await receiver._queue.join()
+
+    assert len(messages) == 1
+    assert messages[0].actorId == 'some actor id'
+    assert isinstance(messages[0].data, Message)
+    assert messages[0].data.id == 'some message id'
+    assert isinstance(memberships[0].data, Membership)
+    assert len(everything) == 3
+    assert receiver.received == 3
+    assert receiver.handled == 3
+
+
+async def test_events_with_valid_signature_are_accepted(test_client):
+    receiver = WebhookReceiver(secret='my secret')
+    client = await create_client(test_client, receiver)
+
+    response = await post(client, event(), sign_with='my secret')
+
+    assert response.status == 204
+    assert receiver.received == 1
+
+
+async def test_events_with_invalid_signature_are_rejected(test_client):
+    receiver = WebhookReceiver(secret='my secret')
+    client = await create_client(test_client, receiver)
+
+    unsigned = await post(client, event())
+    wrongly_signed = await post(client, event(), sign_with='other secret')
+
+    assert unsigned.status == 403
+    assert wrongly_signed.status == 403
+    assert receiver.rejected == 2
+    assert receiver.received == 0
+
+
+async def test_invalid_events_are_rejected(test_client):
+    receiver = WebhookReceiver()
+    client = await create_client(test_client, receiver)
+
+    not_json = await client.post('/webhooks', data=b'not json')
+    not_event = await post(client, {'id': 'some id'})
+
+    assert not_json.status == 400
+    assert not_event.status == 400
+    assert receiver.rejected == 2
+
+
+async def test_failing_handler_does_not_stop_workers(test_client):
+    receiver = WebhookReceiver(workers=1)
+    handled = []
+
+    async def handler(event):
+        if event.event == 'deleted':
+            raise RuntimeError('Failed')
+        handled.append(event)
+
+    receiver.on('messages', None, handler)
+    client = await create_client(test_client, receiver)
+
+    await post(client, event('messages', 'deleted'))
+    await post(client, event('messages', 'created'))
+    await receiver._queue.join()
+
+    assert len(handled) == 1
+    assert receiver.failed == 1
+    assert receiver.handled == 1
+
+
+async def test_full_queue_holds_back_requests(test_client):
+    receiver = WebhookReceiver(workers=1, queue_size=1)
+    release = asyncio.Event()
+    handled = []
+
+    async def handler(event):
+        await release.wait()
+        handled.append(event)
+
+    receiver.on(None, None, handler)
+    client = await create_client(test_client, receiver)
+
+    await post(client, event())
+    await post(client, event())
+    await asyncio.sleep(0.01)
+    assert receiver.queue_depth == 1
+
+    third = asyncio.ensure_future(post(client, event()))
+    await asyncio.sleep(0.05)
+    assert not third.done()
+
+    release.set()
+    response = await third
+    assert response.status == 204
+    await receiver._queue.join()
+    assert len(handled) == 3
+
+
+async def test_stop_handles_queued_events():
+    receiver = WebhookReceiver(workers=2)
+    handled = []
+
+    async def handler(event):
+        await asyncio.sleep(0.01)
+        handled.append(event)
+
+    receiver.on(None, None, handler)
+    await receiver.start()
+    for _ in range(5):
+        await receiver._queue.put(WebhookEvent(event()))
+    await receiver.stop()
+
+    assert len(handled) == 5
+
+
+def test_signature():
+    assert signature('secret', b'body') == (
+        'a18991ff7e4513a1c2d2ee51e3a8e99ca891d9cd')
+
+
+class FakeResource:
+
+    def __init__(self, model, **items):
+        self._model = model
+        self._items = items
+        self.gets = []
+
+    async def get(self, id):
+        self.gets.append(id)
+        await asyncio.sleep(0.001)
+        if id not in self._items:
+            raise SparkApiException(404, {}, 'Not found')
+        return self._model(self._items[id])
+
+
+def message_event(message_id):
+    return WebhookEvent(event(data={'id': message_id}))
+
+
+async def test_enricher_fetches_each_message_once():
+    messages = FakeResource(Message, **{
+        'first': {'id': 'first', 'personId': 'someone', 'text': 'Hi'},
+        'second': {'id': 'second', 'personId': 'someone', 'text': 'Bye'},
+    })
+    enricher = MessageEnricher(messages, window=0.005)
+    received = []
+
+    async def handler(event, message):
+        received.append(message.text)
+
+    handle = enricher.handler(handler)
+    await asyncio.gather(*[
+        handle(message_event(id))
+        for id in ['first', 'second', 'first', 'first']])
+
+    assert sorted(received) == ['Bye', 'Hi', 'Hi', 'Hi']
+    assert sorted(messages.gets) == ['first', 'second']
+    assert enricher.requested == 4
+    assert enricher.fetched == 2
+
+
+async def test_enricher_fetches_senders():
+    messages = FakeResource(Message, **{
+        'first': {'id': 'first', 'personId': 'someone'},
+        'second': {'id': 'second', 'personId': 'someone'},
+    })
+    people = FakeResource(Person, someone={
+        'id': 'someone', 'displayName': 'Some One'})
+    enricher = MessageEnricher(messages, people, window=0.005)
+    received = []
+
+    async def handler(event, message, person):
+        received.append((message.id, person.displayName))
+
+    handle = enricher.handler(handler)
+    await asyncio.gather(
+        handle(message_event('first')),
+        handle(message_event('second')))
+
+    assert sorted(received) == [
+        ('first', 'Some One'), ('second', 'Some One')]
+    assert people.gets == ['someone']
+
+
+async def test_enricher_fetches_again_after_batch():
+    messages = FakeResource(Message, first={'id': 'first'})
+    enricher = MessageEnricher(messages, window=0.001)
+
+    await enricher.message('first')
+    await enricher.message('first')
+
+    assert messages.gets == ['first', 'first']
+
+
+async def test_enricher_errors_reach_every_caller():
+    messages = FakeResource(Message)
+    enricher = MessageEnricher(messages, window=0.001)
+
+    results = await asyncio.gather(
+        enricher.message('missing'),
+        enricher.message('missing'),
+        return_exceptions=True)
+
+    assert all(isinstance(result, SparkApiException) for result in results)
+    assert messages.gets == ['missing']
+
+
+async def test_enricher_limits_concurrency():
+    running = []
+    most = []
+
+    class SlowMessages:
+        async def get(self, id):
+            running.append(id)
+            most.append(len(running))
+            await asyncio.sleep(0.005)
+            running.remove(id)
+            return Message({'id': id})
+
+    enricher = MessageEnricher(SlowMessages(), window=0.001, concurrency=2)
+    results = await asyncio.gather(
+        *[enricher.message(str(i)) for i in range(6)])
+
+    assert [result.id for result in results] == [str(i) for i in range(6)]
+    assert max(most) == 2
@@ -1,11 +1,20 @@
+import asyncio
+import hashlib
 import json
 import io
+import os
+import resource
 
+import aiohttp
 import pytest
 from aiohttp import web
 
 import aiosparkapi.requests as requests
 import aiosparkapi.exceptions as exceptions
+from aiosparkapi.cache import ResponseCache
+from aiosparkapi.codec import JsonCodec
+from aiosparkapi.scheduler import Priority
+from aiosparkapi.upload import Upload
 
 
 def get_headers(request):
@@ -26,6 +35,14 @@ class TestServer:
         self.response = {}
         self._authorized = True
         self._retry_after = None
+        self._retry_times = None
+        self.requests_served = 0
+        self.delay = 0
+        self.connections = set()
+        self.pages = []
+        self.pages_served = []
+        self.failing_pages = []
+        self.contents = {}
 
     def reset(self):
         self.last_parameters = None
@@ -37,16 +54,28 @@ class TestServer:
     def unauthorized(self):
         self._authorized = False
 
-    def retry_after(self, timeout):
+    def retry_after(self, timeout, times=None):
         self._retry_after = timeout
+        self._retry_times = times
+
+    def _throttled(self):
+        if not self._retry_after:
+            return False
+        if self._retry_times is None:
+            return True
+        if self._retry_times == 0:
+            return False
+        self._retry_times -= 1
+        return True
 
     def add_header(self, key, value):
         self._headers[key] = value
 
     async def get_rooms(self, request):
+        self.requests_served += 1
         if not self._authorized:
             return web.Response(status=401)
-        if self._retry_after:
+        if self._throttled():
             return web.Response(
                 status=429,
                 headers={'retry-after': str(self._retry_after)})
@@ -64,8 +93,14 @@ class TestServer:
                 status=self.status_code)
 
     async def get_messages(self, request):
+        self.requests_served += 1
+        await asyncio.sleep(self.delay)
         if not self._authorized:
             return web.Response(status=401)
+        if self._throttled():
+            return web.Response(
+                status=429,
+                headers={'retry-after': str(self._retry_after)})
 
         self.reset()
         self.last_id = request.match_info['id']
@@ -116,19 +151,116 @@ class TestServer:
 
         return web.Response(status=self.status_code)
 
+    async def get_status(self, request):
+        self.connections.add(id(request.transport))
+        status = int(request.match_info['id'])
+        if status == 429:
+            return web.Response(status=429, headers={'retry-after': '1'})
+        if status in [204, 401]:
+            return web.Response(status=status)
+        if status == 502:
+            return web.Response(status=status, text='<html>Bad gateway</html>')
+
+        return web.Response(
+                body=json.dumps({'status': status}).encode(),
+                headers={'content-type': 'application/json'},
+                status=status)
+
+    async def get_pages(self, request):
+        page = int(request.query.get('page', 0))
+        self.pages_served.append(page)
+        await asyncio.sleep(self.delay)
+        if page in self.failing_pages:
+            return web.Response(status=500, text='Failed page')
+
+        headers = {'content-type': 'application/json'}
+        if page + 1 < len(self.pages):
+            headers['Link'] = '<pages?page={}>; rel="next"'.format(page + 1)
+
+        return web.Response(
+                body=json.dumps({'items': self.pages[page]}).encode(),
+                headers=headers)
+
+    async def create_upload(self, request):
+        self.requests_served += 1
+        if self._throttled():
+            return web.Response(
+                status=429,
+                headers={'retry-after': str(self._retry_after)})
+
+        fields = {}
+        reader = await request.multipart()
+        while True:
+            part = await reader.next()
+            if part is None:
+                break
+            if part.filename is None:
+                fields[part.name] = await part.text()
+                continue
+
+            size = 0
+            digest = hashlib.sha1()
+            while True:
+                chunk = await part.read_chunk()
+                if not chunk:
+                    break
+                size += len(chunk)
+                digest.update(chunk)
+            fields[part.name] = {
+                'filename': part.filename,
+                'content_type': part.headers['content-type'],
+                'size': size,
+                'sha1': digest.hexdigest(),
+            }
+
+        return web.Response(
+                body=json.dumps(fields).encode(),
+                headers={'content-type': 'application/json'})
+
+    async def get_contents(self, request):
+        self.requests_served += 1
+        self.last_headers = get_headers(request)
+        content = self.contents.get(request.match_info['id'])
+        if content is None:
+            return web.Response(
+                    body=json.dumps({'message': 'Not found'}).encode(),
+                    headers={'content-type': 'application/json'},
+                    status=404)
+
+        filename, body = content
+        return web.Response(
+                body=body,
+                headers={
+                    'content-type': 'text/plain',
+                    'content-disposition':
+                        'attachment; filename="{}"'.format(filename),
+                })
+
     def create_app(self, loop):
         app = web.Application(loop=loop)
         app.router.add_route('GET', '/rooms', self.get_rooms)
         app.router.add_route('GET', '/messages/{id}', self.get_messages)
+        app.router.add_route('GET', '/status/{id}', self.get_status)
+        app.router.add_route('GET', '/pages', self.get_pages)
+        app.router.add_route('POST', '/uploads', self.create_upload)
+        app.router.add_route('GET', '/contents/{id}', self.get_contents)
+        app.router.add_route('HEAD', '/contents/{id}', self.get_contents)
         app.router.add_route('POST', '/messages', self.create_messages)
         app.router.add_route('PUT', '/messages/{id}', self.update_messages)
         app.router.add_route('DELETE', '/messages/{id}', self.delete_messages)
         return app
 
 
-async def create_api(test_client, server):
+async def collect(iterator):
+    items = []
+    async for item in iterator:
+        items.append(item)
+    return items
+
+
+async def create_api(test_client, server, **kwargs):
     client = await test_client(server.create_app)
-    return requests.Requests('my_bot_token', client)
+    return requests.Requests('my_bot_token', client, **kwargs)
 
 
 @pytest.fixture
@@ -208,6 +340,162 @@ async def test_list_pagination_with_parameters(test_client, test_server):
     assert test_server.last_headers == expected_headers
 
 
+async def test_list_iterates_over_all_pages(test_client, test_server):
+    api = await create_api(test_client, test_server)
+    test_server.pages = [[1, 2], [], [3], [4, 5]]
+
+    response = await api.list('pages')
+
+    assert await collect(response) == [1, 2, 3, 4, 5]
+    assert test_server.pages_served == [0, 1, 2, 3]
+
+
+async def test_list_reads_pages_ahead(test_client, test_server):
+    api = await create_api(test_client, test_server, read_ahead=2)
+    test_server.pages = [[1], [2], [3], [4], [5], [6]]
+
+    response = await api.list('pages')
+    assert await response.__anext__() == 1
+    assert await response.__anext__() == 2
+    await asyncio.sleep(0.05)
+
+    assert test_server.pages_served == [0, 1, 2, 3]
+    assert await collect(response) == [3, 4, 5, 6]
+    assert test_server.pages_served == [0, 1, 2, 3, 4, 5]
+
+
+async def test_list_read_ahead_can_be_set_per_listing(test_client,
+                                                      test_server):
+    api = await create_api(test_client, test_server)
+    test_server.pages = [[1], [2], [3]]
+
+    response = await api.list('pages', read_ahead=1)
+    assert await response.__anext__() == 1
+    assert await response.__anext__() == 2
+    await asyncio.sleep(0.05)
+
+    assert test_server.pages_served == [0, 1, 2]
+
+
+async def test_list_read_ahead_raises_errors_in_order(test_client,
+                                                      test_server):
+    api = await create_api(test_client, test_server, read_ahead=3)
+    test_server.pages = [[1], [2], [3], [4]]
+    test_server.failing_pages = [2]
+
+    response = await api.list('pages')
+
+    assert await response.__anext__() == 1
+    assert await response.__anext__() == 2
+    with pytest.raises(exceptions.ServerError):
+        await response.__anext__()
+    with pytest.raises(StopAsyncIteration):
+        await response.__anext__()
+
+
+async def test_list_read_ahead_stops_on_close(test_client, test_server):
+    api = await create_api(test_client, test_server, read_ahead=1)
+    test_server.pages = [[1], [2], [3], [4], [5]]
+    test_server.delay = 0.05
+
+    response = await api.list('pages')
+    assert await response.__anext__() == 1
+    await asyncio.sleep(0.01)
+    await response.aclose()
+    await asyncio.sleep(0.1)
+
+    assert test_server.pages_served == [0, 1]
+    with pytest.raises(StopAsyncIteration):
+        await response.__anext__()
+
+
+async def test_list_read_ahead_stops_when_abandoned(test_client,
+                                                    test_server):
+    api = await create_api(test_client, test_server, read_ahead=1)
+    test_server.pages = [[1], [2], [3], [4], [5]]
+
+    response = await api.list('pages')
+    assert await response.__anext__() == 1
+    await asyncio.sleep(0.02)
+    prefetcher = response._prefetcher
+    del response
+    await asyncio.sleep(0.05)
+
+    assert prefetcher.cancelled()
+    assert test_server.pages_served == [0, 1]
+
+
+async def test_list_pages_keep_bulk_priority(test_client, test_server):
+    api = await create_api(test_client, test_server)
+    test_server.pages = [[1], [2], [3]]
+    priorities = []
+    acquire = api.scheduler.acquire
+
+    async def recording_acquire(priority):
+        priorities.append(priority)
+        await acquire(priority)
+
+    api.scheduler.acquire = recording_acquire
+
+    await collect(await api.list('pages', priority=Priority.BULK))
+    await collect(await api.list('pages'))
+
+    assert priorities == [
+        Priority.BULK, Priority.BULK, Priority.BULK,
+        Priority.NORMAL, Priority.PAGING, Priority.PAGING]
+
+
+async def test_list_resumes_from_checkpoint(test_client, test_server):
+    api = await create_api(test_client, test_server)
+    test_server.pages = [[1, 2], [3, 4, 5], [6]]
+
+    response = await api.list('pages')
+    for expected in [1, 2, 3]:
+        assert await response.__anext__() == expected
+    stored = json.dumps(response.checkpoint()._asdict())
+    test_server.pages_served = []
+
+    checkpoint = requests.Checkpoint(**json.loads(stored))
+    resumed = await api.resume(checkpoint)
+
+    assert checkpoint.resource == 'pages'
+    assert checkpoint.offset == 1
+    assert await collect(resumed) == [4, 5, 6]
+    assert test_server.pages_served == [1, 2]
+
+
+async def test_checkpoint_at_end_of_page_points_to_next(test_client,
+                                                        test_server):
+    api = await create_api(test_client, test_server, read_ahead=2)
+    test_server.pages = [[1, 2], [3], [4]]
+
+    response = await api.list('pages')
+    assert await response.__anext__() == 1
+    assert await response.__anext__() == 2
+    checkpoint = response.checkpoint()
+    await response.aclose()
+    test_server.pages_served = []
+
+    assert checkpoint.offset == 0
+    assert await collect(await api.resume(checkpoint)) == [3, 4]
+    assert test_server.pages_served == [1, 2]
+
+
+async def test_checkpoint_of_finished_list_resumes_empty(test_client,
+                                                         test_server):
+    api = await create_api(test_client, test_server)
+    test_server.pages = [[1], [2]]
+
+    response = await api.list('pages')
+    await collect(response)
+    checkpoint = response.checkpoint()
+    test_server.pages_served = []
+
+    assert checkpoint.link is None
+    assert await collect(await api.resume(checkpoint)) == []
+    assert test_server.pages_served == []
+
+
 async def test_getting_details(test_client, test_server):
     api = await create_api(test_client, test_server)
     expected = {
@@ -227,6 +515,108 @@ async def test_getting_details(test_client, test_server):
     assert test_server.last_body is None
 
 
+async def test_concurrent_gets_are_coalesced(test_client, test_server):
+    api = await create_api(test_client, test_server)
+    test_server.response = {'get': 'details'}
+    test_server.delay = 0.01
+
+    results = await asyncio.gather(
+        *[api.get('messages', 'some_id') for _ in range(10)],
+        api.get('messages', 'other_id'))
+
+    assert results == [{'get': 'details'}] * 11
+    assert test_server.requests_served == 2
+    assert api.coalesced_gets == 9
+
+    await api.get('messages', 'some_id')
+    assert test_server.requests_served == 3
+
+
+async def test_coalesced_gets_share_errors(test_client, test_server):
+    api = await create_api(test_client, test_server)
+    test_server.unauthorized()
+
+    results = await asyncio.gather(
+        *[api.get('messages', 'some_id') for _ in range(3)],
+        return_exceptions=True)
+
+    assert all(isinstance(result, exceptions.Unauthorized)
+               for result in results)
+    assert test_server.requests_served == 1
+
+
+async def test_cancelling_a_coalesced_get_keeps_others(test_client,
+                                                       test_server):
+    api = await create_api(test_client, test_server)
+    test_server.response = {'get': 'details'}
+    test_server.delay = 0.02
+
+    first = asyncio.ensure_future(api.get('messages', 'some_id'))
+    second = asyncio.ensure_future(api.get('messages', 'some_id'))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == {'get': 'details'}
+    assert test_server.requests_served == 1
+
+
+async def test_get_is_served_from_cache(test_client, test_server):
+    cache = ResponseCache({'messages': 60})
+    api = await create_api(test_client, test_server, cache=cache)
+    test_server.response = {'get': 'details'}
+
+    assert await api.get('messages', 'some_id') == {'get': 'details'}
+    assert await api.get('messages', 'some_id') == {'get': 'details'}
+    assert await api.get('messages', 'other_id') == {'get': 'details'}
+
+    assert test_server.requests_served == 2
+    assert cache.hits == 1
+    assert cache.misses == 2
+    assert api.cache is cache
+
+
+async def test_update_and_delete_invalidate_cache(test_client, test_server):
+    cache = ResponseCache({'messages': 60})
+    api = await create_api(test_client, test_server, cache=cache)
+    test_server.response = {'get': 'details'}
+    await api.get('messages', 'some_id')
+
+    test_server.response = {'get': 'updated'}
+    await api.update('messages', 'some_id', {})
+    assert await api.get('messages', 'some_id') == {'get': 'updated'}
+
+    test_server.status_code = 204
+    await api.delete('messages', 'some_id')
+    assert cache.get('messages', 'some_id') is None
+
+
+async def test_get_racing_an_update_is_not_cached(test_client, test_server):
+    cache = ResponseCache({'messages': 60})
+    api = await create_api(test_client, test_server, cache=cache)
+    answered = asyncio.Event()
+    release = asyncio.Event()
+    send = api._request
+
+    async def slow_request(method, url, **kwargs):
+        result = await send(method, url, **kwargs)
+        if method == 'GET':
+            answered.set()
+            await release.wait()
+        return result
+    api._request = slow_request
+
+    test_server.response = {'get': 'details'}
+    get = asyncio.ensure_future(api.get('messages', 'some_id'))
+    await answered.wait()
+
+    test_server.response = {'get': 'updated'}
+    await api.update('messages', 'some_id', {})
+    release.set()
+
+    assert await get == {'get': 'details'}
+    assert cache.get('messages', 'some_id') == {'get': 'updated'}
+
+
 async def test_create_stuff(test_client, test_server):
     api = await create_api(test_client, test_server)
     expected = {
@@ -282,6 +672,150 @@ async def test_create_stuff_using_multipart(test_client, test_server):
     assert test_server.last_parameters is None
 
 
+async def test_create_streams_upload(test_client, test_server, tmpdir):
+    api = await create_api(test_client, test_server)
+    path = tmpdir.join('report.txt')
+    path.write_binary(b'Some report' * 1000)
+
+    request = {
+        'toPersonEmail': 'someemail@gmail.com',
+        'file': Upload(str(path)),
+    }
+    response = await api.create('uploads', request, multipart=True)
+
+    assert response == {
+        'toPersonEmail': 'someemail@gmail.com',
+        'file': {
+            'filename': 'report.txt',
+            'content_type': 'text/plain',
+            'size': 11000,
+            'sha1': hashlib.sha1(b'Some report' * 1000).hexdigest(),
+        },
+    }
+    assert request['file']._opened is None
+
+
+async def test_create_resends_upload_when_retried(test_client, test_server):
+    api = await create_api(test_client, test_server, retry_jitter=0)
+    test_server.retry_after(0.01, times=1)
+    content = io.BytesIO(b'Some data')
+
+    response = await api.create(
+        'uploads',
+        {'file': Upload(content, 'data.bin')},
+        multipart=True)
+
+    assert response['file']['size'] == 9
+    assert test_server.requests_served == 2
+    assert not content.closed
+
+
+async def test_create_does_not_retry_async_iterable_upload(test_client,
+                                                           test_server):
+    api = await create_api(test_client, test_server, retry_jitter=0)
+    test_server.retry_after(0.01, times=1)
+
+    class Chunks:
+        def __init__(self):
+            self._chunks = [b'Some ', b'data']
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if not self._chunks:
+                raise StopAsyncIteration
+            return self._chunks.pop(0)
+
+    with pytest.raises(exceptions.TooManyRequests):
+        await api.create(
+            'uploads',
+            {'file': Upload(Chunks(), 'data.bin')},
+            multipart=True)
+    assert test_server.requests_served == 1
+
+
+@pytest.mark.skipif(
+    not os.path.exists('/proc/self/statm'),
+    reason='Needs /proc to sample memory use')
+async def test_create_upload_uses_bounded_memory(test_client, test_server,
+                                                 tmpdir):
+    api = await create_api(test_client, test_server)
+    size = 256 * 1024 * 1024
+    path = str(tmpdir.join('large.bin'))
+    with open(path, 'wb') as large:
+        large.truncate(size)
+
+    def resident_memory():
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+
+    samples = []
+
+    async def sample():
+        while True:
+            samples.append(resident_memory())
+            await asyncio.sleep(0.01)
+
+    baseline = resident_memory()
+    sampler = asyncio.ensure_future(sample())
+    try:
+        response = await api.create(
+            'uploads',
+            {'file': Upload(path)},
+            multipart=True)
+    finally:
+        sampler.cancel()
+
+    assert response['file']['size'] == size
+    assert max(samples) - baseline < 32 * 1024 * 1024
+
+
+async def test_head_gets_file_info(test_client, test_server):
+    api = await create_api(test_client, test_server)
+    test_server.contents['some_id'] = ('report.txt', b'Some report')
+
+    info = await api.head('contents/some_id')
+
+    assert info == requests.FileInfo('report.txt', 11, 'text/plain')
+    assert test_server.last_headers == {
+        'Authorization': 'Bearer my_bot_token',
+    }
+
+
+async def test_download_streams_chunks(test_client, test_server):
+    api = await create_api(test_client, test_server)
+    test_server.contents['some_id'] = ('report.txt', b'0123456789')
+
+    async with api.download('contents/some_id', chunk_size=4) as download:
+        chunks = await collect(download)
+
+    assert download.info == requests.FileInfo('report.txt', 10, 'text/plain')
+    assert b''.join(chunks) == b'0123456789'
+    assert max(len(chunk) for chunk in chunks) <= 4
+    assert api.scheduler.in_flight == 0
+
+
+async def test_download_saves_to_directory(test_client, test_server, tmpdir):
+    api = await create_api(test_client, test_server)
+    test_server.contents['some_id'] = ('report.txt', b'Some report')
+
+    async with api.download('contents/some_id') as download:
+        path = await download.save(str(tmpdir))
+
+    assert path == str(tmpdir.join('report.txt'))
+    assert tmpdir.join('report.txt').read_binary() == b'Some report'
+
+
+async def test_download_missing_file(test_client, test_server):
+    api = await create_api(test_client, test_server)
+
+    with pytest.raises(exceptions.NotFound):
+        async with api.download('contents/missing'):
+            pass
+    assert api.scheduler.in_flight == 0
+
+
 async def test_updating(test_client, test_server):
     api = await create_api(test_client, test_server)
     expected = {
@@ -364,6 +898,238 @@ async def test_too_many_requests(test_client, test_server):
         await api.list('rooms')
 
 
+async def test_too_many_requests_is_retried(test_client, test_server):
+    api = await create_api(test_client, test_server, retry_jitter=0)
+    test_server.response = {'items': ['foo']}
+    test_server.retry_after(0.01, times=2)
+
+    response = await api.list('rooms')
+
+    assert await response.__anext__() == 'foo'
+    assert test_server.requests_served == 3
+
+
+async def test_too_many_requests_after_max_retries(test_client, test_server):
+    api = await create_api(
+        test_client,
+        test_server,
+        max_retries=2,
+        retry_jitter=0)
+    test_server.retry_after(0.01)
+
+    with pytest.raises(exceptions.TooManyRequests) as error:
+        await api.get('messages', 'some_id')
+
+    assert error.value.retry_after == 0.01
+    assert test_server.requests_served == 3
+
+
+async def test_too_many_requests_without_retries(test_client, test_server):
+    api = await create_api(test_client, test_server, max_retries=0)
+    test_server.retry_after(0.01)
+
+    with pytest.raises(exceptions.TooManyRequests):
+        await api.get('messages', 'some_id')
+    assert test_server.requests_served == 1
+
+
+async def test_too_many_requests_pauses_all_requests(test_client,
+                                                     test_server):
+    api = await create_api(test_client, test_server, retry_jitter=0)
+    test_server.response = {'get': 'details'}
+    test_server.retry_after(0.05, times=1)
+
+    first = asyncio.ensure_future(api.get('messages', 'first'))
+    await asyncio.sleep(0.02)
+    assert api.pause_gate.paused
+
+    second = asyncio.ensure_future(api.get('messages', 'second'))
+    await asyncio.sleep(0.01)
+    assert test_server.requests_served == 1
+
+    assert await first == {'get': 'details'}
+    assert await second == {'get': 'details'}
+    assert test_server.requests_served == 3
+
+
+async def test_queued_requests_wait_for_the_pause(test_client, test_server):
+    api = await create_api(
+        test_client, test_server, retry_jitter=0, max_in_flight=1)
+    test_server.response = {'get': 'details'}
+    test_server.retry_after(0.05, times=1)
+
+    gets = [asyncio.ensure_future(api.get('messages', str(index)))
+            for index in range(5)]
+    await asyncio.sleep(0.03)
+    assert api.pause_gate.paused
+    assert test_server.requests_served == 1
+
+    assert await asyncio.gather(*gets) == [{'get': 'details'}] * 5
+    assert test_server.requests_served == 6
+
+
+async def test_pause_gate_waits_for_an_extended_pause():
+    gate = requests.PauseGate()
+    gate.pause(0.02)
+    waiter = asyncio.ensure_future(gate.wait())
+    await asyncio.sleep(0.01)
+
+    gate.pause(0.05)
+    await asyncio.sleep(0.03)
+    assert not waiter.done()
+
+    await waiter
+    assert not gate.paused
+
+
+async def test_pause_gate_is_shared_per_token(test_client, test_server):
+    client = await test_client(test_server.create_app)
+    first = requests.Requests('shared_token', client)
+    second = requests.Requests('shared_token', client)
+    other = requests.Requests('other_token', client)
+
+    assert first.pause_gate is second.pause_gate
+    assert first.pause_gate is not other.pause_gate
+
+
+class RecordingLimiter:
+
+    def __init__(self):
+        self.acquired = []
+
+    async def acquire(self, method, resource):
+        self.acquired.append((method, resource))
+
+
+async def test_rate_limiter_is_consulted(test_client, test_server):
+    limiter = RecordingLimiter()
+    api = await create_api(test_client, test_server, rate_limiter=limiter)
+    test_server.response = {'items': ['foo']}
+    test_server.add_header('Link', '<rooms?max=1>; rel="next"')
+
+    response = await api.list('rooms')
+    await response.__anext__()
+    await response.__anext__()
+    await api.get('messages', 'some_id')
+    test_server.status_code = 204
+    await api.delete('messages', 'some_id')
+
+    assert limiter.acquired == [
+        ('GET', 'rooms'),
+        ('GET', 'rooms'),
+        ('GET', 'messages'),
+        ('DELETE', 'messages'),
+    ]
+
+
+async def test_requests_are_limited_by_max_in_flight(test_client,
+                                                     test_server):
+    api = await create_api(test_client, test_server, max_in_flight=1)
+    test_server.response = {'get': 'details'}
+
+    results = await asyncio.gather(
+        *[api.get('messages', str(i)) for i in range(5)])
+
+    assert results == [{'get': 'details'}] * 5
+    assert api.scheduler.requests == 5
+    assert api.scheduler.queued == 4
+    assert api.scheduler.in_flight == 0
+    assert api.scheduler.queue_depth == 0
+
+
+async def test_operation_timeout(test_client, test_server):
+    api = await create_api(
+        test_client,
+        test_server,
+        timeouts={'get': 0.01})
+    test_server.delay = 0.1
+
+    with pytest.raises(asyncio.TimeoutError):
+        await api.get('messages', 'some_id')
+
+
+async def test_operation_timeout_only_applies_to_operation(
+        test_client, test_server):
+    api = await create_api(
+        test_client,
+        test_server,
+        timeouts={'update': 0.01})
+    test_server.response = {'get': 'details'}
+    test_server.delay = 0.05
+
+    assert await api.get('messages', 'some_id') == {'get': 'details'}
+
+
+async def test_connections_are_returned_to_the_pool(test_client,
+                                                    test_server):
+    client = await test_client(
+        test_server.create_app(asyncio.get_event_loop()),
+        connector=aiohttp.TCPConnector(limit=2))
+    api = requests.Requests('my_bot_token', client, max_retries=0)
+    statuses = [200, 204, 400, 401, 404, 429, 500, 502]
+
+    async def call(status):
+        try:
+            return await api.get('status', status)
+        except exceptions.SparkApiException as error:
+            return error
+
+    for _ in range(250):
+        results = await asyncio.wait_for(
+            asyncio.gather(*[call(status) for status in statuses]),
+            timeout=5)
+        assert results[0] == {'status': 200}
+        assert isinstance(results[3], exceptions.Unauthorized)
+        assert isinstance(results[5], exceptions.TooManyRequests)
+
+    assert len(test_server.connections) <= 2
+
+
+async def test_server_error_without_json_body(test_client, test_server):
+    api = await create_api(test_client, test_server)
+
+    with pytest.raises(exceptions.ServerError) as error:
+        await api.get('status', 502)
+
+    assert error.value.response == '<html>Bad gateway</html>'
+
+
+class RecordingCodec(JsonCodec):
+
+    def __init__(self):
+        super(RecordingCodec, self).__init__(self._loads, self._dumps)
+        self.decoded = 0
+        self.encoded = 0
+
+    def _loads(self, data):
+        self.decoded += 1
+        return json.loads(data.decode())
+
+    def _dumps(self, data):
+        self.encoded += 1
+        return json.dumps(data)
+
+
+async def test_json_codec_is_used_for_all_bodies(test_client, test_server):
+    json_codec = RecordingCodec()
+    api = await create_api(test_client, test_server, json_codec=json_codec)
+    test_server.pages = [[1], [2]]
+
+    response = await api.list('pages')
+    assert await collect(response) == [1, 2]
+
+    test_server.response = {'create': 'created'}
+    response = await api.create('messages', {'text': 'Hello'})
+    assert response == {'create': 'created'}
+
+    test_server.status_code = 404
+    with pytest.raises(exceptions.NotFound):
+        await api.get('messages', 'some_id')
+
+    assert json_codec.decoded == 4
+    assert json_codec.encoded == 1
+
+
 async def test_server_error(test_client, test_server):
     api = await create_api(test_client, test_server)
     test_server.status_code = 503
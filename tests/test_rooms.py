@@ -0,0 +1,139 @@
+import pytest
+
+import aiosparkapi.api.rooms
+from .stubrequests import StubRequests
+
+
+async def test_listing_rooms_without_parameters():
+    requests = StubRequests()
+    rooms = aiosparkapi.api.rooms.Rooms(requests)
+
+    await rooms.list()
+
+    assert requests.path == 'rooms'
+    assert requests.list_parameters == {}
+
+
+async def test_listing_rooms_with_all_parameters():
+    requests = StubRequests()
+    rooms = aiosparkapi.api.rooms.Rooms(requests)
+
+    await rooms.list(
+        type='group',
+        teamId='some team id',
+        sortBy='lastactivity',
+        max=100)
+
+    assert requests.path == 'rooms'
+    assert requests.list_parameters == {
+        'type': 'group',
+        'teamId': 'some team id',
+        'sortBy': 'lastactivity',
+        'max': 100,
+    }
+
+
+async def test_listing_rooms_with_invalid_parameters():
+    requests = StubRequests()
+    rooms = aiosparkapi.api.rooms.Rooms(requests)
+
+    with pytest.raises(AssertionError):
+        await rooms.list(type='some type')
+
+    with pytest.raises(AssertionError):
+        await rooms.list(sortBy='title')
+
+
+async def test_listed_rooms_are_traversable():
+    requests = StubRequests()
+    requests.results = [
+        {'id': 'first id', 'title': 'first title'},
+        {'id': 'second id', 'title': 'second title'},
+    ]
+    rooms = aiosparkapi.api.rooms.Rooms(requests)
+
+    result = await rooms.list()
+
+    for expected in requests.results:
+        got = await result.__anext__()
+        assert got == expected
+        assert isinstance(got, aiosparkapi.api.rooms.Room)
+
+    with pytest.raises(StopAsyncIteration):
+        await result.__anext__()
+
+
+async def test_creating_room():
+    requests = StubRequests()
+    requests.results = {'id': 'some id', 'title': 'My room'}
+    rooms = aiosparkapi.api.rooms.Rooms(requests)
+
+    response = await rooms.create(title='My room')
+
+    assert requests.path == 'rooms'
+    assert requests.create_parameters == {'title': 'My room'}
+    assert response == requests.results
+    assert isinstance(response, aiosparkapi.api.rooms.Room)
+
+
+async def test_creating_room_in_team():
+    requests = StubRequests()
+    rooms = aiosparkapi.api.rooms.Rooms(requests)
+
+    await rooms.create(title='My room', teamId='some team id')
+
+    assert requests.create_parameters == {
+        'title': 'My room',
+        'teamId': 'some team id',
+    }
+
+
+async def test_creating_room_without_title():
+    requests = StubRequests()
+    rooms = aiosparkapi.api.rooms.Rooms(requests)
+
+    with pytest.raises(AssertionError):
+        await rooms.create(teamId='some team id')
+
+
+async def test_getting_room():
+    requests = StubRequests()
+    requests.results = {'id': 'some id', 'title': 'My room'}
+    rooms = aiosparkapi.api.rooms.Rooms(requests)
+
+    response = await rooms.get('some id')
+
+    assert requests.path == 'rooms'
+    assert requests.get_id == 'some id'
+    assert isinstance(response, aiosparkapi.api.rooms.Room)
+
+
+async def test_updating_room():
+    requests = StubRequests()
+    requests.results = {'id': 'some id', 'title': 'New title'}
+    rooms = aiosparkapi.api.rooms.Rooms(requests)
+
+    response = await rooms.update('some id', title='New title')
+
+    assert requests.path == 'rooms'
+    assert requests.update_id == 'some id'
+    assert requests.update_parameters == {'title': 'New title'}
+    assert isinstance(response, aiosparkapi.api.rooms.Room)
+
+
+async def test_updating_room_without_title():
+    requests = StubRequests()
+    rooms = aiosparkapi.api.rooms.Rooms(requests)
+
+    with pytest.raises(AssertionError):
+        await rooms.update('some id')
+
+
+async def test_deleting_room():
+    requests = StubRequests()
+    rooms = aiosparkapi.api.rooms.Rooms(requests)
+
+    await rooms.delete('some id')
+
+    assert requests.path == 'rooms'
+    assert requests.delete_id == 'some id'
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from aiosparkapi.scheduler import Priority, RequestScheduler
+
+
+async def test_unbounded_scheduler_never_queues():
+    scheduler = RequestScheduler()
+
+    for _ in range(100):
+        await scheduler.acquire()
+
+    assert scheduler.in_flight == 100
+    assert scheduler.queue_depth == 0
+    assert scheduler.requests == 100
+    assert scheduler.queued == 0
+
+
+async def test_requests_above_limit_are_queued():
+    scheduler = RequestScheduler(2)
+
+    await scheduler.acquire()
+    await scheduler.acquire()
+    waiter = asyncio.ensure_future(scheduler.acquire())
+    await asyncio.sleep(0)
+
+    assert scheduler.in_flight == 2
+    assert scheduler.queue_depth == 1
+    assert not waiter.done()
+
+    scheduler.release()
+    await waiter
+
+    assert scheduler.in_flight == 2
+    assert scheduler.queue_depth == 0
+    assert scheduler.queued == 1
+
+    scheduler.release()
+    scheduler.release()
+    assert scheduler.in_flight == 0
+
+
+async def test_queued_requests_are_served_by_priority():
+    scheduler = RequestScheduler(1)
+    served = []
+
+    async def request(name, priority):
+        async with scheduler.slot(priority):
+            served.append(name)
+            await asyncio.sleep(0)
+
+    await scheduler.acquire()
+    tasks = [
+        asyncio.ensure_future(request('bulk', Priority.BULK)),
+        asyncio.ensure_future(request('paging', Priority.PAGING)),
+        asyncio.ensure_future(request('first', Priority.NORMAL)),
+        asyncio.ensure_future(request('second', Priority.NORMAL)),
+        asyncio.ensure_future(request('reply', Priority.HIGH)),
+    ]
+    await asyncio.sleep(0)
+    assert scheduler.queue_depth == 5
+
+    scheduler.release()
+    await asyncio.gather(*tasks)
+
+    assert served == ['reply', 'first', 'second', 'paging', 'bulk']
+    assert scheduler.in_flight == 0
+
+
+async def test_cancelled_waiter_leaves_the_queue():
+    scheduler = RequestScheduler(1)
+
+    await scheduler.acquire()
+    waiter = asyncio.ensure_future(scheduler.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert scheduler.queue_depth == 0
+    scheduler.release()
+    assert scheduler.in_flight == 0
+
+    await scheduler.acquire()
+    waiter = asyncio.ensure_future(scheduler.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    scheduler.release()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert scheduler.queue_depth == 0
+    assert scheduler.in_flight == 0
+
+
+async def test_wait_time_is_recorded():
+    scheduler = RequestScheduler(1)
+
+    await scheduler.acquire()
+    waiter = asyncio.ensure_future(scheduler.acquire())
+    await asyncio.sleep(0.02)
+    scheduler.release()
+    await waiter
+
+    assert scheduler.max_wait_time >= 0.02
+    assert scheduler.average_wait_time == scheduler.total_wait_time / 2
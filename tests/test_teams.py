@@ -0,0 +1,121 @@
+import pytest
+
+import aiosparkapi.api.teams
+from .stubrequests import StubRequests
+
+
+async def test_listing_teams():
+    requests = StubRequests()
+    teams = aiosparkapi.api.teams.Teams(requests)
+
+    await teams.list(max=50)
+
+    assert requests.path == 'teams'
+    assert requests.list_parameters == {'max': 50}
+
+
+async def test_listed_teams_are_traversable():
+    requests = StubRequests()
+    requests.results = [
+        {'id': 'first id', 'name': 'first team'},
+        {'id': 'second id', 'name': 'second team'},
+    ]
+    teams = aiosparkapi.api.teams.Teams(requests)
+
+    result = await teams.list()
+
+    for expected in requests.results:
+        got = await result.__anext__()
+        assert got == expected
+        assert isinstance(got, aiosparkapi.api.teams.Team)
+
+    with pytest.raises(StopAsyncIteration):
+        await result.__anext__()
+
+
+async def test_creating_team():
+    requests = StubRequests()
+    requests.results = {'id': 'some id', 'name': 'My team'}
+    teams = aiosparkapi.api.teams.Teams(requests)
+
+    response = await teams.create(name='My team')
+
+    assert requests.path == 'teams'
+    assert requests.create_parameters == {'name': 'My team'}
+    assert isinstance(response, aiosparkapi.api.teams.Team)
+
+    with pytest.raises(AssertionError):
+        await teams.create()
+
+
+async def test_getting_updating_and_deleting_team():
+    requests = StubRequests()
+    requests.results = {'id': 'some id', 'name': 'My team'}
+    teams = aiosparkapi.api.teams.Teams(requests)
+
+    response = await teams.get('some id')
+    assert requests.get_id == 'some id'
+    assert isinstance(response, aiosparkapi.api.teams.Team)
+
+    response = await teams.update('some id', name='New name')
+    assert requests.update_id == 'some id'
+    assert requests.update_parameters == {'name': 'New name'}
+    assert isinstance(response, aiosparkapi.api.teams.Team)
+
+    await teams.delete('some id')
+    assert requests.path == 'teams'
+    assert requests.delete_id == 'some id'
+
+
+async def test_listing_team_memberships():
+    requests = StubRequests()
+    requests.results = [{'id': 'some id', 'teamId': 'some team id'}]
+    memberships = aiosparkapi.api.teams.TeamMemberships(requests)
+
+    result = await memberships.list(teamId='some team id', max=10)
+
+    assert requests.path == 'team/memberships'
+    assert requests.list_parameters == {'teamId': 'some team id', 'max': 10}
+    got = await result.__anext__()
+    assert isinstance(got, aiosparkapi.api.teams.TeamMembership)
+
+    with pytest.raises(AssertionError):
+        await memberships.list()
+
+
+async def test_creating_team_membership():
+    requests = StubRequests()
+    memberships = aiosparkapi.api.teams.TeamMemberships(requests)
+
+    await memberships.create(
+        teamId='some team id',
+        personEmail='person@example.com',
+        isModerator=True)
+
+    assert requests.path == 'team/memberships'
+    assert requests.create_parameters == {
+        'teamId': 'some team id',
+        'personEmail': 'person@example.com',
+        'isModerator': True,
+    }
+
+    with pytest.raises(AssertionError):
+        await memberships.create(teamId='some team id')
+
+
+async def test_getting_updating_and_deleting_team_membership():
+    requests = StubRequests()
+    requests.results = {'id': 'some id', 'isModerator': True}
+    memberships = aiosparkapi.api.teams.TeamMemberships(requests)
+
+    response = await memberships.get('some id')
+    assert requests.get_id == 'some id'
+    assert isinstance(response, aiosparkapi.api.teams.TeamMembership)
+
+    await memberships.update('some id', isModerator=True)
+    assert requests.update_id == 'some id'
+    assert requests.update_parameters == {'isModerator': True}
+
+    await memberships.delete('some id')
+    assert requests.path == 'team/memberships'
+    assert requests.delete_id == 'some id'
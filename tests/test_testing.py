@@ -0,0 +1,135 @@
+import pytest
+
+import aiosparkapi.exceptions as exceptions
+from aiosparkapi import AioSparkApi
+from aiosparkapi.api.messages import Message
+from aiosparkapi.testing import FakeSparkServer
+
+
+async def collect(iterator):
+    items = []
+    async for item in iterator:
+        items.append(item)
+    return items
+
+
+async def create_api(server, **kwargs):
+    await server.start()
+    api = AioSparkApi(
+        access_token='my_bot_token',
+        baseurl=server.url,
+        retry_jitter=0,
+        **kwargs)
+    await api.setup()
+    return api
+
+
+async def test_fake_server_pages_listings():
+    server = FakeSparkServer(page_size=3)
+    room_id, = server.populate(rooms=1, messages=10, people=2)
+    api = await create_api(server)
+
+    messages = await collect(await api.messages.list(roomId=room_id))
+    members = await collect(await api.memberships.list(roomId=room_id))
+
+    assert [message.text for message in messages] == [
+        'Message {}'.format(i) for i in reversed(range(10))]
+    assert all(isinstance(message, Message) for message in messages)
+    assert server.calls[('list', 'messages')] == 4
+    assert sorted(member.personEmail for member in members) == [
+        'person0@example.com', 'person1@example.com']
+
+    await api.close()
+    await server.close()
+
+
+async def test_fake_server_creates_updates_and_deletes():
+    async with FakeSparkServer() as server:
+        api = await create_api(server)
+
+        room = await api.rooms.create(title='My room')
+        message = await api.messages.create(toRoomId=room.id, text='Hello')
+        room = await api.rooms.update(room.id, title='New title')
+        me = await api.people.me()
+
+        assert room.title == 'New title'
+        assert message.roomId == room.id
+        assert message.personId == me.id
+        assert (await api.messages.get(message.id)).text == 'Hello'
+
+        await api.messages.delete(message.id)
+        with pytest.raises(exceptions.NotFound):
+            await api.messages.get(message.id)
+        with pytest.raises(exceptions.InvalidRequest):
+            await api._requests.create('rooms', {})
+
+        await api.close()
+
+
+async def test_fake_server_throttles_and_fails():
+    async with FakeSparkServer(retry_after=0.01) as server:
+        room_id, = server.populate()
+        api = await create_api(server)
+
+        server.throttle(2)
+        room = await api.rooms.get(room_id)
+        assert room.id == room_id
+        assert server.throttled == 2
+
+        server.error_rate = 1
+        with pytest.raises(exceptions.ServerError):
+            await api.rooms.get(room_id)
+        assert server.errors == 1
+
+        await api.close()
+
+
+async def test_fake_server_checks_token():
+    async with FakeSparkServer(token='right token') as server:
+        api = await create_api(server)
+
+        with pytest.raises(exceptions.Unauthorized):
+            await api.people.me()
+
+        await api.close()
+
+
+async def test_fake_server_filters_messages():
+    async with FakeSparkServer() as server:
+        room_id, = server.populate(messages=5)
+        ids = [id for id, item in server.resources['messages'].items()
+               if item['roomId'] == room_id]
+        server.resources['messages'][ids[1]]['mentionedPeople'] = [
+            server.me['id']]
+        api = await create_api(server)
+
+        before_message = await collect(await api.messages.list(
+            roomId=room_id, beforeMessage=ids[3]))
+        created = server.resources['messages'][ids[2]]['created']
+        before = await collect(await api.messages.list(
+            roomId=room_id, before=created))
+        mentioned = await collect(await api.messages.list(
+            roomId=room_id, mentionedPeople='me'))
+
+        assert [message.id for message in before_message] == [
+            ids[2], ids[1], ids[0]]
+        assert [message.id for message in before] == [ids[1], ids[0]]
+        assert [message.id for message in mentioned] == [ids[1]]
+
+        await api.close()
+
+
+async def test_fake_server_rejects_unsupported_parameters():
+    async with FakeSparkServer() as server:
+        room_id, = server.populate(messages=1)
+        api = await create_api(server)
+
+        with pytest.raises(exceptions.InvalidRequest):
+            await api.messages.list(roomId=room_id, unknown='value')
+        with pytest.raises(exceptions.InvalidRequest):
+            await api.messages.list(roomId=room_id, beforeMessage='missing')
+
+        rooms = await collect(await api.rooms.list(sortBy='lastactivity'))
+        assert [room.id for room in rooms] == [room_id]
+
+        await api.close()
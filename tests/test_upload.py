@@ -0,0 +1,87 @@
+import io
+
+from aiosparkapi.upload import Upload
+
+
+async def read(upload):
+    content = upload.open()
+    if isinstance(content, bytes):
+        return content
+    chunks = []
+    async for chunk in content:
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def test_name_and_content_type_from_path():
+    upload = Upload('/some/directory/report.pdf')
+
+    assert upload.name == 'report.pdf'
+    assert upload.content_type == 'application/pdf'
+
+
+def test_name_and_content_type_from_file_object(tmpdir):
+    path = tmpdir.join('image.png')
+    path.write_binary(b'png')
+
+    with open(str(path), 'rb') as content:
+        upload = Upload(content)
+
+    assert upload.name == 'image.png'
+    assert upload.content_type == 'image/png'
+
+
+def test_unknown_content_type():
+    upload = Upload(b'data')
+
+    assert upload.name == 'file'
+    assert upload.content_type == 'application/octet-stream'
+
+
+def test_explicit_name_and_content_type():
+    upload = Upload(b'data', 'notes', 'text/plain')
+
+    assert upload.name == 'notes'
+    assert upload.content_type == 'text/plain'
+
+
+async def test_path_is_streamed_in_chunks_and_closed(tmpdir):
+    path = tmpdir.join('data.bin')
+    path.write_binary(b'0123456789')
+    upload = Upload(str(path), chunk_size=4)
+
+    chunks = []
+    async for chunk in upload.open():
+        chunks.append(chunk)
+    opened = upload._opened
+    upload.close()
+
+    assert chunks == [b'0123', b'4567', b'89']
+    assert opened.closed
+
+
+async def test_file_object_is_rewound_and_left_open():
+    content = io.BytesIO(b'skip data')
+    content.read(5)
+    upload = Upload(content)
+
+    assert await read(upload) == b'data'
+    assert await read(upload) == b'data'
+    upload.close()
+
+    assert upload.replayable
+    assert not content.closed
+
+
+def test_async_iterable_is_not_replayable():
+
+    class Chunks:
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            raise StopAsyncIteration
+
+    assert not Upload(Chunks()).replayable
+    assert Upload(b'data').replayable
+    assert Upload('path').replayable
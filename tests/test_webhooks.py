@@ -1,7 +1,10 @@
+import collections
+
 import pytest
 
 import aiosparkapi.api.webhooks
-from .stubrequests import StubRequests
+from aiosparkapi.exceptions import SparkApiException
+from .stubrequests import IterableFaker, StubRequests
 
 
 async def test_listing_webhooks():
@@ -205,6 +208,16 @@ async def test_updating_webhook():
     assert response == requests.results
     assert isinstance(response, aiosparkapi.api.webhooks.Webhook)
 
+    await webhooks.update(
+        'webhook id to change',
+        name='my new name',
+        targetUrl='my new target url',
+        secret='my new secret')
+
+    assert requests.update_parameters == {'name': 'my new name',
+                                          'targetUrl': 'my new target url',
+                                          'secret': 'my new secret'}
+
 
 async def test_updating_webhook_missing_required_parameters():
     requests = StubRequests()
@@ -219,3 +232,129 @@ async def test_updating_webhook_missing_required_parameters():
         await webhooks.update(
             'webhook id to change',
             name='my webhook name')
+
+
+class WebhookServer:
+
+    def __init__(self, *webhooks):
+        self.webhooks = collections.OrderedDict(
+            (webhook['id'], dict(webhook)) for webhook in webhooks)
+        self.lists = 0
+        self.calls = []
+        self.failing = set()
+
+    async def list(self, path, parameters=None, **kwargs):
+        self.lists += 1
+        return IterableFaker(list(self.webhooks.values()))
+
+    async def create(self, path, parameters, **kwargs):
+        self.calls.append(('create', parameters['name']))
+        if parameters['name'] in self.failing:
+            raise SparkApiException(400, {}, 'Bad request')
+        webhook = dict(parameters, id='id{}'.format(len(self.calls)))
+        self.webhooks[webhook['id']] = webhook
+        return webhook
+
+    async def update(self, path, update_id, parameters, **kwargs):
+        self.calls.append(('update', update_id))
+        self.webhooks[update_id].update(parameters)
+        return self.webhooks[update_id]
+
+    async def delete(self, path, delete_id, **kwargs):
+        self.calls.append(('delete', delete_id))
+        del self.webhooks[delete_id]
+        return True
+
+
+def webhook(name, targetUrl='https://target', **kwargs):
+    return dict({
+        'name': name,
+        'targetUrl': targetUrl,
+        'resource': 'messages',
+        'event': 'created',
+    }, **kwargs)
+
+
+async def test_sync_creates_updates_and_deletes():
+    server = WebhookServer(
+        webhook('same', id='1'),
+        webhook('moved', 'https://old', id='2'),
+        webhook('unwanted', id='3'),
+        webhook('same', id='4'),
+        webhook('filtered', id='5', filter='roomId=1'))
+    webhooks = aiosparkapi.api.webhooks.Webhooks(server)
+
+    report = await webhooks.sync([
+        webhook('same'),
+        webhook('moved', 'https://new'),
+        webhook('new', secret='secret'),
+        webhook('filtered', filter='roomId=2'),
+    ])
+
+    assert report.ok
+    assert server.lists == 1
+    assert [w.name for w in report.unchanged] == ['same']
+    assert [w.id for w in report.updated] == ['2']
+    assert sorted(w.name for w in report.created) == ['filtered', 'new']
+    assert sorted(w.id for w in report.deleted) == ['3', '4', '5']
+    assert server.webhooks['2']['targetUrl'] == 'https://new'
+    assert sorted(
+        (w['name'], w.get('filter')) for w in server.webhooks.values()) == [
+        ('filtered', 'roomId=2'), ('moved', None),
+        ('new', None), ('same', None)]
+
+
+async def test_sync_updates_changed_secret():
+    server = WebhookServer(
+        webhook('rotated', id='1', secret='old'),
+        webhook('kept', id='2', secret='old'))
+    webhooks = aiosparkapi.api.webhooks.Webhooks(server)
+
+    report = await webhooks.sync([
+        webhook('rotated', secret='new'),
+        webhook('kept'),
+    ])
+
+    assert [w.id for w in report.updated] == ['1']
+    assert [w.id for w in report.unchanged] == ['2']
+    assert server.webhooks['1']['secret'] == 'new'
+    assert server.webhooks['2']['secret'] == 'old'
+
+
+async def test_sync_twice_makes_no_changes():
+    server = WebhookServer()
+    webhooks = aiosparkapi.api.webhooks.Webhooks(server)
+    desired = [webhook('first'), webhook('second', resource='rooms')]
+
+    await webhooks.sync(desired)
+    calls = len(server.calls)
+    report = await webhooks.sync(desired)
+
+    assert len(server.calls) == calls
+    assert len(report.unchanged) == 2
+    assert not report.created and not report.updated and not report.deleted
+
+
+async def test_sync_without_prune_keeps_other_webhooks():
+    server = WebhookServer(webhook('other', id='1'))
+    webhooks = aiosparkapi.api.webhooks.Webhooks(server)
+
+    report = await webhooks.sync([webhook('mine')], prune=False)
+
+    assert not report.deleted
+    assert '1' in server.webhooks
+    assert len(server.webhooks) == 2
+
+
+async def test_sync_reports_failed_changes():
+    server = WebhookServer()
+    server.failing.add('broken')
+    webhooks = aiosparkapi.api.webhooks.Webhooks(server)
+
+    report = await webhooks.sync([webhook('broken'), webhook('working')])
+
+    assert not report.ok
+    assert [w.name for w in report.created] == ['working']
+    desired, error = report.errors[0]
+    assert desired['name'] == 'broken'
+    assert isinstance(error, SparkApiException)